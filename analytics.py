@@ -0,0 +1,225 @@
+import os
+import csv
+import glob
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    user_id INTEGER,
+    ticker TEXT,
+    amount REAL,
+    best_model TEXT,
+    rmse REAL,
+    mape REAL,
+    profit REAL
+);
+
+CREATE TABLE IF NOT EXISTS ticker_stats (
+    ticker TEXT PRIMARY KEY,
+    requests INTEGER NOT NULL,
+    total_amount REAL NOT NULL,
+    total_profit REAL NOT NULL,
+    last_ts TEXT
+);
+CREATE TABLE IF NOT EXISTS model_stats (
+    best_model TEXT PRIMARY KEY,
+    wins INTEGER NOT NULL,
+    sum_rmse REAL NOT NULL,
+    sum_mape REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    requests INTEGER NOT NULL,
+    total_amount REAL NOT NULL,
+    total_profit REAL NOT NULL,
+    last_ts TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS requests_ticker ON requests (ticker, ts);
+CREATE INDEX IF NOT EXISTS requests_user ON requests (user_id, ts);
+CREATE INDEX IF NOT EXISTS requests_model ON requests (best_model, ts);
+"""
+
+# Агрегаты обновляются вместе со вставкой строк, поэтому /stats читает
+# только маленькие таблицы и не сканирует историю запросов
+UPSERTS = {
+    'ticker': """INSERT INTO ticker_stats VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (ticker) DO UPDATE SET
+            requests = requests + excluded.requests,
+            total_amount = total_amount + excluded.total_amount,
+            total_profit = total_profit + excluded.total_profit,
+            last_ts = max(last_ts, excluded.last_ts)""",
+    'best_model': """INSERT INTO model_stats VALUES (?, ?, ?, ?)
+        ON CONFLICT (best_model) DO UPDATE SET
+            wins = wins + excluded.wins,
+            sum_rmse = sum_rmse + excluded.sum_rmse,
+            sum_mape = sum_mape + excluded.sum_mape""",
+    'user_id': """INSERT INTO user_stats VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            requests = requests + excluded.requests,
+            total_amount = total_amount + excluded.total_amount,
+            total_profit = total_profit + excluded.total_profit,
+            last_ts = max(last_ts, excluded.last_ts)""",
+}
+
+def _aggregate(records, key, fields):
+    """Сложение полей по ключу внутри пачки: один UPSERT на ключ, а не на строку"""
+    groups = {}
+    for record in records:
+        group = groups.get(record[key])
+        if group is None:
+            groups[record[key]] = [1] + [record[field] for field in fields] + [record['ts']]
+        else:
+            group[0] += 1
+            for i, field in enumerate(fields, 1):
+                group[i] += record[field]
+            group[-1] = max(group[-1], record['ts'])
+    return groups
+
+def _number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return cast(0)
+
+class AnalyticsStore:
+    """История запросов в SQLite с индексами и сводными таблицами"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # Запись идет из потока логгера, чтение - из пула потоков бота
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.executescript(INDEXES)
+        self.lock = threading.Lock()
+
+    def add_rows(self, rows, update_stats=True):
+        """Строки в формате CSV лога: timestamp, user_id, ticker, amount, best_model, rmse, mape, profit"""
+        records = [{
+            'ts': str(row[0]),
+            'user_id': _number(row[1], int),
+            'ticker': str(row[2]),
+            'amount': _number(row[3]),
+            'best_model': str(row[4]),
+            'rmse': _number(row[5]),
+            'mape': _number(row[6]),
+            'profit': _number(row[7]),
+        } for row in rows]
+        if not records:
+            return
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO requests (ts, user_id, ticker, amount, best_model, rmse, mape, profit) "
+                "VALUES (:ts, :user_id, :ticker, :amount, :best_model, :rmse, :mape, :profit)",
+                records
+            )
+            if not update_stats:
+                return
+            for key, fields in (('ticker', ('amount', 'profit')), ('user_id', ('amount', 'profit'))):
+                groups = _aggregate(records, key, fields)
+                self.connection.executemany(UPSERTS[key], [(k,) + tuple(v) for k, v in groups.items()])
+            groups = _aggregate(records, 'best_model', ('rmse', 'mape'))
+            self.connection.executemany(UPSERTS['best_model'], [(k,) + tuple(v[:-1]) for k, v in groups.items()])
+
+    def is_empty(self):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM requests LIMIT 1").fetchone() is None
+
+    def backfill(self, log_file, batch_size=10000):
+        """Первичная загрузка из CSV лога и его ротированных копий (только в пустую базу)"""
+        if not self.is_empty():
+            return 0
+
+        # Индексы строятся один раз после загрузки, а не обновляются на каждой строке
+        with self.lock:
+            self.connection.executescript(
+                "DROP INDEX IF EXISTS requests_ticker; DROP INDEX IF EXISTS requests_user; "
+                "DROP INDEX IF EXISTS requests_model;"
+            )
+        
+        root, ext = os.path.splitext(log_file)
+        paths = sorted(glob.glob(f"{root}.*{ext}")) + [log_file]
+        total = 0
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                batch = []
+                for row in reader:
+                    if len(row) < 8:
+                        continue
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        self.add_rows(batch, update_stats=False)
+                        total += len(batch)
+                        batch = []
+                self.add_rows(batch, update_stats=False)
+                total += len(batch)
+        
+        with self.lock:
+            self.connection.executescript(INDEXES)
+        # Сводные таблицы после массовой загрузки быстрее пересчитать одним GROUP BY
+        self.rebuild_stats()
+        print(f"[ANALYTICS] Загружено {total} строк из CSV лога")
+        return total
+
+    def rebuild_stats(self):
+        """Пересчет сводных таблиц по всей истории запросов"""
+        with self.lock, self.connection:
+            self.connection.executescript("""
+                DELETE FROM ticker_stats;
+                DELETE FROM model_stats;
+                DELETE FROM user_stats;
+                INSERT INTO ticker_stats
+                    SELECT ticker, count(*), sum(amount), sum(profit), max(ts) FROM requests GROUP BY ticker;
+                INSERT INTO model_stats
+                    SELECT best_model, count(*), sum(rmse), sum(mape) FROM requests GROUP BY best_model;
+                INSERT INTO user_stats
+                    SELECT user_id, count(*), sum(amount), sum(profit), max(ts) FROM requests GROUP BY user_id;
+            """)
+
+    def stats(self, user_id=None, limit=5):
+        """Сводка для /stats: тикеры, модели, пользователь и общие итоги"""
+        with self.lock:
+            execute = self.connection.execute
+            tickers = execute(
+                "SELECT ticker, requests, total_profit FROM ticker_stats "
+                "ORDER BY requests DESC LIMIT ?", (limit,)
+            ).fetchall()
+            models = execute(
+                "SELECT best_model, wins, sum_rmse / wins, sum_mape / wins FROM model_stats "
+                "ORDER BY wins DESC"
+            ).fetchall()
+            user = None
+            if user_id is not None:
+                user = execute(
+                    "SELECT requests, total_amount, total_profit, last_ts FROM user_stats WHERE user_id = ?",
+                    (user_id,)
+                ).fetchone()
+            totals = execute(
+                "SELECT count(*), coalesce(sum(requests), 0), coalesce(sum(total_profit), 0) FROM user_stats"
+            ).fetchone()
+
+        return {
+            'tickers': tickers,
+            'models': models,
+            'user': user,
+            'users': totals[0],
+            'requests': totals[1],
+            'total_profit': totals[2],
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,77 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+class AsyncDataFetcher:
+    """Асинхронная обертка над DataLoader.
+
+    Загрузка выполняется в пуле потоков, чтобы не блокировать event loop.
+    Одновременные запросы одного тикера объединяются в одну загрузку.
+    """
+
+    def __init__(self, data_loader, max_workers=4):
+        self.data_loader = data_loader
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self.in_flight = {}
+
+    async def fetch(self, ticker):
+        ticker = ticker.upper()
+
+        future = self.in_flight.get(ticker)
+        if future is None:
+            print(f"[FETCH] Новая загрузка {ticker}")
+            future = asyncio.ensure_future(self._download(ticker))
+            self.in_flight[ticker] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(ticker, None))
+        else:
+            print(f"[FETCH] {ticker} уже загружается, ждем результат")
+
+        # shield: отмена одного ожидающего не должна отменять загрузку для остальных
+        return await asyncio.shield(future)
+
+    async def fetch_many(self, tickers):
+        """Загрузка нескольких тикеров одним пакетным запросом.
+
+        Тикеры, которые уже загружаются, не запрашиваются повторно.
+        """
+        tickers = [ticker.upper() for ticker in tickers]
+        loop = asyncio.get_running_loop()
+
+        missing = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self.in_flight]
+        if missing:
+            print(f"[FETCH] Пакетная загрузка: {', '.join(missing)}")
+            pending = {}
+            for ticker in missing:
+                future = loop.create_future()
+                future.add_done_callback(lambda _, t=ticker: self.in_flight.pop(t, None))
+                self.in_flight[ticker] = pending[ticker] = future
+            batch = asyncio.ensure_future(self._download_batch(missing))
+            batch.add_done_callback(lambda task: self._resolve_batch(task, pending))
+
+        futures = [asyncio.shield(self.in_flight[ticker]) for ticker in tickers]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        return {
+            ticker: (None if isinstance(result, Exception) else result)
+            for ticker, result in zip(tickers, results)
+        }
+
+    def _resolve_batch(self, task, pending):
+        for ticker, future in pending.items():
+            if future.done():
+                continue
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result().get(ticker))
+
+    async def _download_batch(self, tickers):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.data_loader.download_batch, tickers)
+
+    async def _download(self, ticker):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.data_loader.download_data, ticker)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,129 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data_loader import DataLoader
+from model_selector import fit_linear_batch
+from strategy import optimal_positions
+
+def forecast_grid(prices, origins, horizon, window):
+    """Прогнозы легких моделей во всех точках сразу: {модель: (точки × horizon)}"""
+    # Строка i - последние window цен перед точкой origins[i]
+    windows = sliding_window_view(prices, window)[origins - window]
+    slopes, intercepts = fit_linear_batch(windows)
+    steps = np.arange(window, window + horizon)
+    return {
+        'Линейная модель': slopes[:, None] * steps + intercepts[:, None],
+        'Скользящее среднее': np.repeat(windows.mean(axis=1, keepdims=True), horizon, axis=1),
+    }
+
+def backtest_ticker(prices, horizons=(30,), windows=(10,), costs=(0.001,), max_trades=None, step=None):
+    """Бэктест стратегии на истории одного тикера по сетке параметров.
+
+    В каждой точке прогноза модель строит прогноз на horizon дней, по нему
+    выбираются сделки (optimal_positions), а доход считается по фактическим
+    ценам. Точки идут с шагом step (по умолчанию horizon, без перекрытия),
+    поэтому эпизоды складываются в кривую капитала для просадки. Все окна,
+    модели и комиссии одного горизонта считаются одной матрицей.
+    """
+    prices = np.asarray(prices, dtype=float)
+    log_prices = np.log(prices)
+    rows = []
+
+    for horizon in horizons:
+        # Общие точки прогноза для всех окон, чтобы результаты были сравнимы
+        first = max(windows)
+        origins = np.arange(first, len(prices) - horizon + 1, step or horizon)
+        if len(origins) == 0:
+            continue
+
+        # Фактические цены эпизодов и их дневные лог-изменения
+        actual = sliding_window_view(log_prices, horizon)[origins]
+        moves = np.diff(actual, axis=1)
+
+        # Строки матрицы: окно × модель × комиссия × точка прогноза
+        forecasts = []
+        labels = []
+        for window in windows:
+            for model, forecast in forecast_grid(prices, origins, horizon, window).items():
+                for cost in costs:
+                    forecasts.append(forecast)
+                    labels.append((model, window, cost))
+        forecasts = np.concatenate(forecasts)
+        row_costs = np.repeat([cost for _, _, cost in labels], len(origins))
+
+        positions = optimal_positions(forecasts, row_costs, max_trades)
+        trades = np.diff(positions.astype(np.int8), axis=1, prepend=0) == 1
+        returns = (positions * np.tile(moves, (len(labels), 1))).sum(axis=1)
+        returns += trades.sum(axis=1) * 2 * np.log1p(-row_costs)
+
+        returns = returns.reshape(len(labels), len(origins))
+        traded = trades.sum(axis=1).reshape(len(labels), len(origins))
+        equity = np.cumsum(returns, axis=1)
+        drawdown = np.maximum.accumulate(np.maximum(equity, 0), axis=1) - equity
+
+        for i, (model, window, cost) in enumerate(labels):
+            active = traded[i] > 0
+            rows.append({
+                'model': model,
+                'horizon': horizon,
+                'window': window,
+                'cost': cost,
+                'episodes': len(origins),
+                'trades': int(traded[i].sum()),
+                'pnl': float(np.expm1(equity[i, -1])),
+                'hit_rate': float((returns[i][active] > 0).mean()) if active.any() else float('nan'),
+                'max_drawdown': float(-np.expm1(-drawdown[i].max())),
+                'buy_and_hold': float(np.expm1(log_prices[origins[-1] + horizon - 1] - log_prices[origins[0]])),
+            })
+
+    return pd.DataFrame(rows)
+
+def run_backtests(tickers, data_loader=None, **grid):
+    """Бэктест нескольких тикеров на котировках из DataLoader"""
+    data_loader = data_loader or DataLoader()
+    frames = []
+    for ticker in tickers:
+        prices = data_loader.download_data(ticker)
+        if prices is None:
+            print(f"❌ Нет данных для {ticker}")
+            continue
+        result = backtest_ticker(prices, **grid)
+        result.insert(0, 'ticker', ticker)
+        frames.append(result)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бэктест торговой стратегии на истории котировок")
+    parser.add_argument('tickers', nargs='*', default=['AAPL', 'MSFT', 'TSLA'])
+    parser.add_argument('--horizons', type=int, nargs='+', default=[10, 20, 30])
+    parser.add_argument('--windows', type=int, nargs='+', default=[5, 10, 20, 50])
+    parser.add_argument('--costs', type=float, nargs='+', default=[0, 0.001, 0.005])
+    parser.add_argument('--max-trades', type=int, default=None)
+    parser.add_argument('--step', type=int, default=None)
+    parser.add_argument('--csv', help="сохранить результаты в CSV")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = run_backtests(
+        [t.upper() for t in args.tickers],
+        horizons=args.horizons, windows=args.windows, costs=args.costs,
+        max_trades=args.max_trades, step=args.step
+    )
+    elapsed = time.perf_counter() - start
+    if results.empty:
+        return 1
+
+    with pd.option_context('display.width', 200, 'display.max_rows', 100):
+        print(results.sort_values('pnl', ascending=False).to_string(index=False, float_format='{:.4f}'.format))
+    print(f"\n{len(results)} бэктестов за {elapsed:.2f} с")
+    if args.csv:
+        results.to_csv(args.csv, index=False)
+        print(f"✅ Результаты сохранены в {args.csv}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
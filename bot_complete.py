@@ -1,9 +1,11 @@
 import asyncio
 import sys
 import os
+import re
 import logging
 import numpy as np
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -18,17 +20,28 @@ print(f"Время запуска: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 print("="*60)
 
 from aiogram import Bot, Dispatcher, types
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.utils import executor
+from aiogram.utils.exceptions import BadRequest
 
 # Импортируем наши модули
+import config
 from data_loader import DataLoader
+from async_fetcher import AsyncDataFetcher
 from model_selector import ModelSelector
-from visualization import Visualizer
+from model_cache import ForecastCache, ChartCache
+from model_pool import HeavyModelPool
+from visualization import ChartRenderer
 from strategy import TradingStrategy
-from logger import Logger
+from logger import BufferedLogger
+from analytics import AnalyticsStore
+from sessions import SharedPriceStore, SessionTracker, SessionMiddleware
+from scheduler import FairScheduler, QueueFull, UserBusy, RateLimited
+from progress import ProgressReporter
+from webhook_server import start_webhook
+from shared_storage import create_storage, SQLiteCache
 
 # ========== КОНФИГУРАЦИЯ ==========
 
@@ -37,13 +50,58 @@ TELEGRAM_TOKEN = ""
 
 
 # Инициализация компонентов
-bot = Bot(token=TELEGRAM_TOKEN)
-dp = Dispatcher(bot, storage=MemoryStorage())
+# Пустой токен здесь - берем TELEGRAM_TOKEN из окружения (.env)
+bot = Bot(token=TELEGRAM_TOKEN or config.TELEGRAM_TOKEN, server=TelegramAPIServer.from_base(config.TELEGRAM_API_URL)
+          if config.TELEGRAM_API_URL else TELEGRAM_PRODUCTION)
+# Состояния диалогов: в памяти процесса или в общем хранилище (переживают перезапуск,
+# доступны всем процессам кластера)
+dp = Dispatcher(bot, storage=create_storage(config.STORAGE_BACKEND, config.SHARED_DB,
+                                            config.REDIS_URL, config.SESSION_TTL))
+shared_cache = config.STORAGE_BACKEND != 'memory'
+# В состоянии сессии только тикер и версия данных, сами ряды - в общем хранилище
+price_store = SharedPriceStore()
+sessions = SessionTracker(dp.storage, price_store, ttl=config.SESSION_TTL,
+                          sweep_interval=config.SESSION_SWEEP_INTERVAL)
+dp.middleware.setup(SessionMiddleware(sessions))
 data_loader = DataLoader()
+data_fetcher = AsyncDataFetcher(data_loader, max_workers=config.FETCH_MAX_WORKERS)
+analysis_executor = ThreadPoolExecutor(max_workers=config.ANALYSIS_MAX_WORKERS, thread_name_prefix="analysis")
 model_selector = ModelSelector()
-visualizer = Visualizer()
+if shared_cache:
+    forecast_cache = SQLiteCache(config.SHARED_DB, 'forecast', maxsize=config.FORECAST_CACHE_SIZE)
+else:
+    forecast_cache = ForecastCache(maxsize=config.FORECAST_CACHE_SIZE)
+heavy_pool = HeavyModelPool(max_workers=config.HEAVY_MAX_WORKERS,
+                            background_workers=config.HYPERPARAM_SEARCH_WORKERS)
+scheduler = FairScheduler(
+    max_workers=config.QUEUE_WORKERS,
+    max_queue=config.QUEUE_MAX_SIZE,
+    max_per_user=config.QUEUE_MAX_PER_USER,
+    rate_limit=config.USER_RATE_LIMIT,
+    rate_window=config.USER_RATE_WINDOW,
+    notify_interval=config.QUEUE_NOTIFY_INTERVAL
+)
+chart_renderer = ChartRenderer(
+    max_workers=config.CHART_WORKERS,
+    width=config.CHART_WIDTH,
+    height=config.CHART_HEIGHT,
+    dpi=config.CHART_DPI
+)
+if shared_cache:
+    chart_cache = SQLiteCache(config.SHARED_DB, 'chart', maxsize=config.CHART_CACHE_SIZE)
+else:
+    chart_cache = ChartCache(maxsize=config.CHART_CACHE_SIZE)
 strategy_module = TradingStrategy  # Класс, а не экземпляр
-app_logger = Logger("logs/logs.csv")
+analytics_store = AnalyticsStore(config.ANALYTICS_DB)
+app_logger = BufferedLogger(
+    config.LOG_FILE,
+    max_buffer=config.LOG_BUFFER_SIZE,
+    flush_interval=config.LOG_FLUSH_INTERVAL,
+    max_bytes=config.LOG_MAX_BYTES,
+    rotate_daily=config.LOG_ROTATE_DAILY,
+    store=analytics_store,
+    backup_count=config.LOG_BACKUP_COUNT
+)
 
 # ========== СОСТОЯНИЯ ==========
 
@@ -66,6 +124,7 @@ async def start_command(message: types.Message):
         "• Рассчитать потенциальную прибыль\n\n"
         "📋 *Как использовать:*\n"
         "1. Введите тикер компании (например: AAPL, TSLA, MSFT)\n"
+        "   или несколько через запятую: AAPL, MSFT, TSLA\n"
         "2. Введите сумму для условной инвестиции\n"
         "3. Получите анализ и прогноз\n\n"
         "📊 *Примеры тикеров:*\n"
@@ -85,15 +144,58 @@ async def start_command(message: types.Message):
 @dp.message_handler(commands=['status'])
 async def status_command(message: types.Message):
     """Проверка статуса бота"""
+    session_count, session_bytes, shared_bytes = await sessions.report()
     await message.answer(
         "✅ *Статус бота:* Работает нормально\n"
         f"• Время: {datetime.now().strftime('%H:%M:%S')}\n"
         "• Модели готовы к работе\n"
-        "• Источник данных: Yahoo Finance\n\n"
+        f"• Источник данных: {data_loader.provider.title}\n"
+        f"• Сессий: {session_count}, в среднем {session_bytes / 1024:.1f} КБ на сессию\n"
+        f"• Общие ряды цен: {len(price_store)}, {shared_bytes / 1024:.1f} КБ\n"
+        f"• Очередь анализов: {scheduler.running} выполняется, {scheduler.queued()} ожидает\n"
+        f"• Хранилище сессий: {config.STORAGE_BACKEND}"
+        + (f", процесс #{config.CLUSTER_WORKER}" if config.CLUSTER_WORKER else "") + "\n\n"
         "Введите /start для начала анализа",
         parse_mode='Markdown'
     )
 
+@dp.message_handler(commands=['stats'])
+async def stats_command(message: types.Message):
+    """Статистика запросов по тикерам, моделям и пользователю"""
+    loop = asyncio.get_running_loop()
+    stats = await loop.run_in_executor(analysis_executor, analytics_store.stats, message.from_user.id)
+    
+    if not stats['requests']:
+        await message.answer("📊 Статистика пока пуста. Введите /start для анализа")
+        return
+    
+    lines = [
+        "📊 *Статистика запросов*",
+        f"• Всего анализов: {stats['requests']}",
+        f"• Пользователей: {stats['users']}",
+        f"• Суммарная прибыль прогнозов: ${stats['total_profit']:.2f}",
+        "",
+        "🔥 *Популярные тикеры:*",
+    ]
+    for ticker, requests, profit in stats['tickers']:
+        lines.append(f"• {ticker} - запросов: {requests}, прибыль ${profit:.2f}")
+    
+    lines += ["", "🤖 *Модели-победители:*"]
+    for model, wins, rmse, mape in stats['models']:
+        lines.append(f"• {model} - побед: {wins}, средний RMSE {rmse:.2f}, MAPE {mape:.2%}")
+    
+    if stats['user']:
+        requests, amount, profit, last_ts = stats['user']
+        lines += [
+            "",
+            "👤 *Ваши запросы:*",
+            f"• Анализов: {requests}, сумма ${amount:.2f}",
+            f"• Потенциальная прибыль: ${profit:.2f}",
+            f"• Последний: {last_ts}",
+        ]
+    
+    await message.answer("\n".join(lines), parse_mode='Markdown')
+
 # ========== ОБРАБОТКА ТИКЕРА ==========
 
 @dp.message_handler(state=UserState.waiting_ticker)
@@ -102,13 +204,14 @@ async def process_ticker(message: types.Message, state: FSMContext):
     # Очищаем ввод
     user_input = message.text.strip().upper()
     
-    # Берем только первый тикер если введено несколько
-    if ',' in user_input:
-        ticker = user_input.split(',')[0].strip()
-    elif ' ' in user_input:
-        ticker = user_input.split()[0].strip()
-    else:
-        ticker = user_input
+    # Несколько тикеров через запятую или пробел - пакетный анализ
+    tickers = list(dict.fromkeys(t for t in re.split(r'[,\s]+', user_input) if t))
+    
+    if len(tickers) > 1:
+        await process_batch_tickers(message, state, tickers[:config.BATCH_MAX_TICKERS])
+        return
+    
+    ticker = tickers[0] if tickers else ""
     
     print(f"[BOT] Получен тикер: {ticker}")
     
@@ -121,14 +224,18 @@ async def process_ticker(message: types.Message, state: FSMContext):
         )
         return
     
-    # Начинаем загрузку
-    status_msg = await message.answer(f"⏳ Загружаю данные для *{ticker}*...", parse_mode='Markdown')
+    # Мгновенная проверка по локальному индексу тикеров
+    known, suggestions = data_loader.check_ticker(ticker)
+    if not known:
+        await message.answer(unknown_ticker_text(ticker, suggestions), parse_mode='Markdown')
+        return
     
-    # Загрузка данных
-    prices = data_loader.download_data(ticker)
+    # Загрузка данных (в фоне, не блокируя других пользователей); статус - только если она затянется
+    async with ProgressReporter(message, f"⏳ Загружаю данные для *{ticker}*...",
+                                min_interval=config.PROGRESS_MIN_INTERVAL):
+        prices = await data_fetcher.fetch(ticker)
     
     if prices is None or len(prices) < 30:
-        await status_msg.delete()
         await message.answer(
             f"❌ Не удалось загрузить данные для *{ticker}*.\n"
             f"Проверьте правильность тикера и попробуйте снова.",
@@ -138,12 +245,14 @@ async def process_ticker(message: types.Message, state: FSMContext):
     
     current_price = float(prices[-1])
     
-    await status_msg.edit_text(f"✅ Загружено {len(prices)} дней данных")
-    
-    # Сохраняем данные в состоянии
+    # В состоянии - только ссылка на общий ряд цен
+    data_version = data_loader.data_version(ticker, prices)
+    owner = (state.chat, state.user)
+    price_store.release(owner)
+    prices = price_store.acquire(owner, ticker, data_version, prices)
     await state.update_data({
         'ticker': ticker,
-        'prices': prices,
+        'data_version': data_version,
         'current_price': current_price
     })
     
@@ -160,11 +269,148 @@ async def process_ticker(message: types.Message, state: FSMContext):
     
     await UserState.waiting_amount.set()
 
+def unknown_ticker_text(ticker, suggestions):
+    text = f"❌ Тикер *{ticker}* не найден."
+    if suggestions:
+        text += f"\nВозможно, вы имели в виду: {', '.join(suggestions)}"
+    return text
+
+async def process_batch_tickers(message: types.Message, state: FSMContext, tickers):
+    """Пакетная загрузка нескольких тикеров"""
+    print(f"[BOT] Получены тикеры: {', '.join(tickers)}")
+    
+    invalid = [t for t in tickers if len(t) > 10]
+    if invalid:
+        await message.answer(
+            f"❌ Неверный формат тикера: {', '.join(invalid)}\n"
+            "Примеры: AAPL, MSFT, TSLA"
+        )
+        return
+    
+    unknown = []
+    for ticker in tickers:
+        known, suggestions = data_loader.check_ticker(ticker)
+        if not known:
+            unknown.append(unknown_ticker_text(ticker, suggestions))
+    if unknown:
+        await message.answer("\n".join(unknown), parse_mode='Markdown')
+        return
+    
+    # Одна пакетная загрузка для всех тикеров
+    async with ProgressReporter(message, f"⏳ Загружаю данные для {len(tickers)} тикеров: *{', '.join(tickers)}*...",
+                                min_interval=config.PROGRESS_MIN_INTERVAL):
+        results = await data_fetcher.fetch_many(tickers)
+    
+    loaded = {t: p for t, p in results.items() if p is not None and len(p) >= 50}
+    failed = [t for t in tickers if t not in loaded]
+    
+    if not loaded:
+        await message.answer(
+            f"❌ Не удалось загрузить данные для *{', '.join(tickers)}*.\n"
+            f"Проверьте правильность тикеров и попробуйте снова.",
+            parse_mode='Markdown'
+        )
+        return
+    
+    owner = (state.chat, state.user)
+    price_store.release(owner)
+    versions = {}
+    for t, p in loaded.items():
+        versions[t] = data_loader.data_version(t, p)
+        price_store.acquire(owner, t, versions[t], p)
+    await state.update_data({
+        'tickers': list(loaded),
+        'data_versions': versions
+    })
+    
+    lines = [f"• {t}: ${float(p[-1]):.2f} ({len(p)} дней)" for t, p in loaded.items()]
+    if failed:
+        lines.append(f"⚠️ Не загружены: {', '.join(failed)}")
+    
+    await message.answer(
+        f"📊 *Портфель из {len(loaded)} тикеров:*\n"
+        + "\n".join(lines) +
+        f"\n\n💵 *Введите общую сумму для инвестиции ($):*\n"
+        f"Сумма будет распределена поровну.",
+        parse_mode='Markdown'
+    )
+    
+    await UserState.waiting_amount.set()
+
 # ========== ОБРАБОТКА СУММЫ ==========
 
+async def session_prices(state, user_data):
+    """Ряд цен сессии из общего хранилища; если его уже удалили - загружаем заново.
+
+    Загруженные данные могут быть новее: версия пересчитывается и
+    сохраняется в состоянии (и в user_data), чтобы ключ кэша прогноза
+    соответствовал ряду, по которому идет анализ.
+    """
+    ticker = user_data.get('ticker')
+    if ticker is None:
+        return None
+    prices = price_store.get(ticker, user_data.get('data_version'))
+    if prices is None:
+        prices = await data_fetcher.fetch(ticker)
+        if prices is None:
+            return None
+        version = data_loader.data_version(ticker, prices)
+        prices = price_store.acquire((state.chat, state.user), ticker, version, prices)
+        user_data['data_version'] = version
+        await state.update_data({'data_version': version})
+    return prices
+
+async def session_batch_prices(state, user_data):
+    """То же для портфеля: заново загруженные тикеры получают новые версии"""
+    versions = dict(user_data.get('data_versions', {}))
+    batch_prices = {t: price_store.get(t, versions.get(t)) for t in user_data['tickers']}
+    missing = [t for t, p in batch_prices.items() if p is None]
+    if missing:
+        owner = (state.chat, state.user)
+        for t, p in (await data_fetcher.fetch_many(missing)).items():
+            if p is None:
+                continue
+            versions[t] = data_loader.data_version(t, p)
+            batch_prices[t] = price_store.acquire(owner, t, versions[t], p)
+        user_data['data_versions'] = versions
+        await state.update_data({'data_versions': versions})
+    return {t: p for t, p in batch_prices.items() if p is not None}
+
 @dp.message_handler(state=UserState.waiting_amount)
 async def process_amount(message: types.Message, state: FSMContext):
+    """Постановка анализа в общую очередь"""
+    try:
+        float(message.text.strip().replace(',', '.'))
+    except ValueError:
+        # Ошибку формата суммы сообщаем сразу, без очереди
+        await run_analysis(message, state)
+        return
+    
+    queue_msg = None
+    
+    async def on_position(position):
+        nonlocal queue_msg
+        if position == 0:
+            if queue_msg is not None:
+                await queue_msg.delete()
+                queue_msg = None
+        elif queue_msg is None:
+            queue_msg = await message.answer(f"⏳ Вы #{position} в очереди на анализ")
+        else:
+            await queue_msg.edit_text(f"⏳ Вы #{position} в очереди на анализ")
+    
+    try:
+        await scheduler.submit(message.from_user.id, lambda: run_analysis(message, state), on_position)
+    except RateLimited as e:
+        await message.answer(f"⚠️ Слишком много запросов. Попробуйте через {e.retry_after:.0f} с")
+    except UserBusy:
+        await message.answer("⏳ Ваш предыдущий запрос еще обрабатывается, дождитесь результата")
+    except QueueFull:
+        await message.answer("⚠️ Бот сейчас перегружен. Попробуйте через пару минут")
+
+async def run_analysis(message: types.Message, state: FSMContext):
     """Обработка введенной суммы инвестиции"""
+    progress = None
     try:
         # Парсим сумму
         amount_text = message.text.strip().replace(',', '.')
@@ -180,87 +426,75 @@ async def process_amount(message: types.Message, state: FSMContext):
         
         # Получаем данные из состояния
         user_data = await state.get_data()
+        
+        if user_data.get('tickers'):
+            batch_prices = await session_batch_prices(state, user_data)
+            if not batch_prices:
+                await message.answer("❌ Данные не найдены. Начните заново /start")
+                await sessions.finish(state)
+                return
+            await process_batch_amount(message, state, amount, batch_prices)
+            return
+        
         ticker = user_data.get('ticker')
-        prices = user_data.get('prices')
+        prices = await session_prices(state, user_data)
         
         if prices is None:
             await message.answer("❌ Данные не найдены. Начните заново /start")
-            await state.finish()
+            await sessions.finish(state)
             return
         
         print(f"[BOT] Анализ {ticker}, данных: {len(prices)}, сумма: ${amount}")
         
-        # Начинаем анализ
-        status_msg = await message.answer(
-            "🔍 *Начинаю анализ...*\n\n"
-            "Этапы:\n"
-            "1. Подготовка данных ✓\n"
-            "2. Обучение моделей...\n"
-            "3. Построение прогноза...\n"
-            "4. Формирование рекомендаций...",
-            parse_mode='Markdown'
-        )
-        
         # ========== ПОДГОТОВКА ДАННЫХ ==========
         if len(prices) < 50:
             await message.answer("❌ Недостаточно данных для анализа")
-            await state.finish()
+            await sessions.finish(state)
             return
         
-        # Разделяем данные
-        split_idx = int(len(prices) * 0.8)
-        train_data = prices[:split_idx]
-        test_data = prices[split_idx:]
+        print(f"[ANALYSIS] Данные: всего={len(prices)}")
         
-        print(f"[ANALYSIS] Данные: всего={len(prices)}, train={len(train_data)}, test={len(test_data)}")
+        # Этапы показываются одним сообщением, правки объединяются и идут не чаще
+        # PROGRESS_MIN_INTERVAL; если анализ быстрее интервала, сообщения не будет
+        progress = ProgressReporter(
+            message, "🔍 *Анализ...*",
+            ["Подготовка данных", "Обучение моделей", "Построение прогноза", "Формирование рекомендаций"],
+            min_interval=config.PROGRESS_MIN_INTERVAL
+        ).start(done=1)
         
         # ========== ОБУЧЕНИЕ МОДЕЛЕЙ ==========
-        await status_msg.edit_text(
-            "🔍 *Анализ...*\n\n"
-            "Этапы:\n"
-            "1. Подготовка данных ✓\n"
-            "2. Обучение моделей ✓\n"
-            "3. Построение прогноза...\n"
-            "4. Формирование рекомендаций...",
-            parse_mode='Markdown'
-        )
-        
-        # Обучаем модели
-        best_model_name, metrics = model_selector.train_and_evaluate(train_data, test_data)
+        # Обучаем модели (или берем готовый результат из кэша)
+        cache_key = (ticker, user_data.get('data_version'), model_selector.config_key())
+        cached = await cache_call(forecast_cache.get, cache_key)
+        if cached is not None:
+            print(f"[CACHE] Модели для {ticker} уже обучены, пропускаем обучение")
+            best_model_name, metrics, forecast = cached
+        else:
+            # Параллельный турнир: легкие модели в потоках, ARIMA и ML в процессах
+            best_model_name, metrics = await model_selector.run_tournament(
+                ticker, prices, heavy_pool, analysis_executor
+            )
+            forecast = None
+        progress.advance()
         
         # ========== ПОСТРОЕНИЕ ПРОГНОЗА ==========
-        await status_msg.edit_text(
-            "🔍 *Анализ...*\n\n"
-            "Этапы:\n"
-            "1. Подготовка данных ✓\n"
-            "2. Обучение моделей ✓\n"
-            "3. Построение прогноза ✓\n"
-            "4. Формирование рекомендаций...",
-            parse_mode='Markdown'
-        )
-        
         # Делаем прогноз
-        last_values = list(prices[-30:]) if len(prices) >= 30 else list(prices)
-        forecast = model_selector.best_model.predict(last_values, steps=30)
+        if forecast is None:
+            # Модель обучена на всем ряде - прогноз продолжает его с последнего дня
+            forecast = metrics[best_model_name]['model'].predict(prices, steps=30)
+            forecast.flags.writeable = False
+            # В кэше только метрики: обученные модели весят мегабайты
+            metrics = {name: {key: values[key] for key in ('RMSE', 'MAPE') if key in values}
+                       for name, values in metrics.items()}
+            await cache_call(forecast_cache.put, cache_key, (best_model_name, metrics, forecast))
         
         print(f"[ANALYSIS] Прогноз создан: {len(forecast)} дней")
-        
-        # ========== ВИЗУАЛИЗАЦИЯ ==========
-        plot_buffer = visualizer.create_forecast_plot(prices[-100:], forecast, ticker)
+        progress.advance()
         
         # ========== ИНВЕСТИЦИОННЫЕ РЕКОМЕНДАЦИИ ==========
-        await status_msg.edit_text(
-            "🔍 *Анализ...*\n\n"
-            "Этапы:\n"
-            "1. Подготовка данных ✓\n"
-            "2. Обучение моделей ✓\n"
-            "3. Построение прогноза ✓\n"
-            "4. Формирование рекомендаций ✓",
-            parse_mode='Markdown'
-        )
-        
         # Создаем стратегию
-        strategy = strategy_module(forecast, amount)
+        strategy = strategy_module(forecast, amount, cost=config.STRATEGY_COST,
+                                   max_trades=config.STRATEGY_MAX_TRADES)
         profit = strategy.calculate_profit()
         recommendations = strategy.generate_recommendations()
         
@@ -296,16 +530,22 @@ async def process_amount(message: types.Message, state: FSMContext):
             f"• Дата: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n"
             
             f"⚠️ *УЧЕБНЫЙ ПРИМЕР*\n"
-            f"Не является финансовой рекомендацией"
+            f"Не является финансовой рекомендацией\n\n"
+            
+            f"💡 *Для нового анализа введите /start*\n"
+            f"Хотите попробовать другой тикер?"
         )
+        progress.advance()
         
-        # ========== ОТПРАВКА РЕЗУЛЬТАТОВ ==========
-        await bot.send_photo(
-            chat_id=message.chat.id,
-            photo=plot_buffer,
-            caption=response,
-            parse_mode='Markdown'
-        )
+        # ========== ВИЗУАЛИЗАЦИЯ И ОТПРАВКА ==========
+        history = prices[-100:]
+        chart_key = ChartCache.key('forecast', (history, forecast), (ticker,) + chart_renderer.settings)
+        
+        def render():
+            return chart_renderer.forecast_plot(history, forecast, ticker)
+        
+        await progress.close()
+        await send_result(message, chart_key, render, response)
         
         # ========== ЛОГИРОВАНИЕ ==========
         app_logger.log_request(
@@ -317,34 +557,137 @@ async def process_amount(message: types.Message, state: FSMContext):
             profit=profit
         )
         
-        await status_msg.delete()
-        
-        # Финальное сообщение
-        await message.answer(
-            "💡 *Для нового анализа введите /start*\n\n"
-            "Хотите попробовать другой тикер?",
-            parse_mode='Markdown'
-        )
-        
-        await state.finish()
+        await sessions.finish(state)
         
     except ValueError:
+        if progress is not None:
+            await progress.close()
         await message.answer(
             "❌ Неверный формат суммы!\n"
             "Введите число (например: 1000 или 1500.50):"
         )
     except Exception as e:
-        print(f"[ERROR] Ошибка в process_amount: {e}")
+        print(f"[ERROR] Ошибка в run_analysis: {e}")
         import traceback
         traceback.print_exc()
         
+        if progress is not None:
+            await progress.close()
         await message.answer(
             f"❌ Произошла ошибка при анализе\n"
             f"Попробуйте еще раз или выберите другой тикер.\n\n"
             f"Ошибка: `{str(e)[:100]}`",
             parse_mode='Markdown'
         )
-        await state.finish()
+        await sessions.finish(state)
+
+async def send_result(message, chart_key, render, response):
+    """Итог анализа одним сообщением: график с подписью, а если подпись не
+    помещается в 1024 символа - график и отдельный текст"""
+    if len(response) <= 1024:
+        await send_chart(message.chat.id, chart_key, render, caption=response, parse_mode='Markdown')
+    else:
+        await send_chart(message.chat.id, chart_key, render)
+        await message.answer(response, parse_mode='Markdown')
+
+async def cache_call(method, *args):
+    """Вызов метода кэша; общий кэш (SQLite) работает в своем потоке, не блокируя event loop"""
+    cache = method.__self__
+    if isinstance(cache, SQLiteCache):
+        return await cache.call(method, *args)
+    return method(*args)
+
+async def send_chart(chat_id, chart_key, render, **kwargs):
+    """Отправка графика: по file_id, если такой график уже отправлялся, иначе
+    отрисовка и загрузка PNG с запоминанием file_id"""
+    file_id = await cache_call(chart_cache.get, chart_key)
+    if file_id is not None:
+        try:
+            return await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+        except BadRequest as e:
+            # file_id мог стать недействительным - строим график заново
+            print(f"[CHART] Не удалось отправить по file_id: {e}")
+    
+    sent = await bot.send_photo(chat_id=chat_id, photo=await render(), **kwargs)
+    await cache_call(chart_cache.put, chart_key, sent.photo[-1].file_id)
+    return sent
+
+def analyze_batch(batch_prices, amount):
+    """Выбор модели, прогноз и прибыль для всех тикеров (выполняется в пуле потоков)"""
+    # Модель каждого тикера выбирается так же, как при анализе одного тикера
+    selected = model_selector.evaluate_batch(batch_prices)
+    
+    results = {}
+    for ticker, (name, metrics) in selected.items():
+        forecast = metrics[name]['model'].predict(batch_prices[ticker], steps=30)
+        results[ticker] = {
+            'best_model': name,
+            'metrics': {key: float(metrics[name][key]) for key in ('RMSE', 'MAPE')},
+            'forecast': forecast,
+            'profit': float(strategy_module(forecast, amount).calculate_profit())
+        }
+    return results
+
+async def process_batch_amount(message: types.Message, state: FSMContext, amount, batch_prices):
+    """Параллельный анализ нескольких тикеров с общим ответом"""
+    tickers = list(batch_prices)
+    amount_per_ticker = amount / len(tickers)
+    
+    print(f"[BOT] Пакетный анализ {', '.join(tickers)}, сумма: ${amount}")
+    
+    loop = asyncio.get_running_loop()
+    async with ProgressReporter(message, f"🔍 *Анализирую {len(tickers)} тикеров...*",
+                                min_interval=config.PROGRESS_MIN_INTERVAL):
+        results = await loop.run_in_executor(analysis_executor, analyze_batch, batch_prices, amount_per_ticker)
+    
+    histories = {t: batch_prices[t][-100:] for t in tickers}
+    forecasts = {t: results[t]['forecast'] for t in tickers}
+    chart_key = ChartCache.key(
+        'batch',
+        [histories[t] for t in tickers] + [forecasts[t] for t in tickers],
+        tuple(tickers) + chart_renderer.settings
+    )
+    
+    def render():
+        return chart_renderer.batch_plot(histories, forecasts)
+    
+    lines = []
+    total_profit = 0
+    for t in tickers:
+        result = results[t]
+        current_price = float(batch_prices[t][-1])
+        forecast_price = float(result['forecast'][-1])
+        change_percent = ((forecast_price - current_price) / current_price) * 100
+        total_profit += result['profit']
+        lines.append(
+            f"*{t}*: ${current_price:.2f} → ${forecast_price:.2f} ({change_percent:+.1f}%)\n"
+            f"  {result['best_model']}, прибыль ${result['profit']:.2f}"
+        )
+    
+    response = (
+        f"📊 *ПОРТФЕЛЬ: {', '.join(tickers)}*\n\n"
+        + "\n".join(lines) +
+        f"\n\n💰 *ИТОГО:*\n"
+        f"• Сумма: ${amount:.2f} (по ${amount_per_ticker:.2f} на тикер)\n"
+        f"• Потенциальная прибыль: ${total_profit:.2f} ({total_profit/amount*100:+.1f}%)\n\n"
+        f"⚠️ *УЧЕБНЫЙ ПРИМЕР*\n"
+        f"Не является финансовой рекомендацией\n\n"
+        f"💡 *Для нового анализа введите /start*"
+    )
+    
+    await send_result(message, chart_key, render, response)
+    
+    for t in tickers:
+        app_logger.log_request(
+            user_id=message.from_user.id,
+            ticker=t,
+            amount=amount_per_ticker,
+            best_model=results[t]['best_model'],
+            metrics=results[t]['metrics'],
+            profit=results[t]['profit']
+        )
+    
+    await sessions.finish(state)
 
 # ========== ОБРАБОТКА ДРУГИХ СООБЩЕНИЙ ==========
 
@@ -357,6 +700,7 @@ async def handle_unknown(message: types.Message):
             f"Доступные команды:\n"
             f"• /start - Начать анализ акций\n"
             f"• /status - Проверить статус бота\n"
+            f"• /stats - Статистика запросов\n"
             f"• /help - Помощь\n\n"
             f"Или просто введите тикер акции для анализа"
         )
@@ -372,6 +716,20 @@ async def on_startup(_):
     # Создаем необходимые директории
     os.makedirs('logs', exist_ok=True)
     
+    # Процессы отрисовки стартуют и строят шаблоны графиков до первого запроса
+    chart_renderer.warm_up()
+    
+    # Неактивные сессии удаляются по SESSION_TTL
+    sessions.start()
+    
+    # Лог запросов пишется пачками из фоновой задачи; при первом запуске
+    # база /stats заполняется из существующего CSV лога
+    # (в кластере это делает диспетчер один раз для всех процессов)
+    if not config.CLUSTER_WORKER:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(analysis_executor, analytics_store.backfill, config.LOG_FILE)
+    await app_logger.start()
+    
     print("📁 Структура проекта:")
     print("├── bot_complete.py      (этот файл)")
     print("├── data_loader.py       (загрузка данных)")
@@ -382,15 +740,48 @@ async def on_startup(_):
     print("└── logs/               (логи запросов)")
     print("\n🚀 Бот запущен! Откройте Telegram и начните работу.")
 
+async def on_startup_webhook(dispatcher):
+    await on_startup(dispatcher)
+    # Несколько экземпляров за прокси регистрируют один и тот же адрес - это безопасно
+    if config.WEBHOOK_URL:
+        await bot.set_webhook(config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH,
+                              secret_token=config.WEBHOOK_SECRET or None)
+        print(f"🌐 Вебхук: {config.WEBHOOK_URL.rstrip('/')}{config.WEBHOOK_PATH}")
+
+async def on_shutdown(_):
+    """Действия при остановке"""
+    await sessions.stop()
+    await app_logger.stop()
+    analytics_store.close()
+    data_fetcher.shutdown()
+    analysis_executor.shutdown(wait=False)
+    heavy_pool.shutdown()
+    chart_renderer.shutdown()
+
 if __name__ == '__main__':
     try:
-        print("🚀 Запуск polling...")
-        executor.start_polling(
-            dp,
-            skip_updates=True,
-            on_startup=on_startup,
-            timeout=60
-        )
+        if config.BOT_MODE == 'webhook':
+            # Вебхук не удаляется при остановке: остальные экземпляры продолжают работу
+            print(f"🚀 Запуск webhook на {config.WEBAPP_HOST}:{config.WEBAPP_PORT}{config.WEBHOOK_PATH}...")
+            start_webhook(
+                dp,
+                path=config.WEBHOOK_PATH,
+                host=config.WEBAPP_HOST,
+                port=config.WEBAPP_PORT,
+                on_startup=on_startup_webhook,
+                on_shutdown=on_shutdown,
+                secret=config.WEBHOOK_SECRET or None,
+                drain_timeout=config.WEBHOOK_DRAIN_TIMEOUT
+            )
+        else:
+            print("🚀 Запуск polling...")
+            executor.start_polling(
+                dp,
+                skip_updates=True,
+                on_startup=on_startup,
+                on_shutdown=on_shutdown,
+                timeout=60
+            )
     except KeyboardInterrupt:
         print("\n🛑 Бот остановлен пользователем")
     except Exception as e:
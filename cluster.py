@@ -0,0 +1,212 @@
+import os
+import sys
+import signal
+import asyncio
+import secrets
+import argparse
+import subprocess
+
+import aiohttp
+from aiogram import Bot
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
+
+import config
+from analytics import AnalyticsStore
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_complete.py")
+
+def update_user(update):
+    """id пользователя (или чата) из обновления - по нему выбирается процесс"""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        for field in ('from', 'user'):
+            if isinstance(value.get(field), dict) and 'id' in value[field]:
+                return value[field]['id']
+        if isinstance(value.get('chat'), dict) and 'id' in value['chat']:
+            return value['chat']['id']
+    return update.get('update_id', 0)
+
+class Worker:
+    """Процесс бота в режиме webhook на локальном порту"""
+
+    def __init__(self, index, port, secret, path=config.WEBHOOK_PATH):
+        self.index = index
+        self.port = port
+        self.secret = secret
+        self.url = f"http://127.0.0.1:{port}{path}"
+        self.process = None
+
+    def start(self):
+        root, ext = os.path.splitext(config.LOG_FILE)
+        env = dict(
+            os.environ,
+            BOT_MODE='webhook',
+            WEBHOOK_URL='',
+            WEBHOOK_PATH=config.WEBHOOK_PATH,
+            WEBHOOK_SECRET=self.secret,
+            WEBAPP_HOST='127.0.0.1',
+            WEBAPP_PORT=str(self.port),
+            CLUSTER_WORKER=str(self.index),
+            STORAGE_BACKEND=config.STORAGE_BACKEND,
+            # Свой CSV лог у каждого процесса: ротация не пересекается, а
+            # backfill находит все файлы по маске logs.*.csv
+            LOG_FILE=f"{root}.worker{self.index}{ext}",
+        )
+        # Своя группа процессов: Ctrl+C получает только диспетчер и останавливает процессы по порядку
+        self.process = subprocess.Popen([sys.executable, BOT_SCRIPT], env=env, start_new_session=True)
+        print(f"[CLUSTER] Процесс #{self.index} запущен (pid {self.process.pid}, порт {self.port})")
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        # SIGINT - штатная остановка aiohttp: начатые обновления дорабатывают
+        if self.alive():
+            self.process.send_signal(signal.SIGINT)
+
+    def wait(self, timeout):
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            print(f"[CLUSTER] Процесс #{self.index} не завершился за {timeout:.0f} с, останавливаем")
+            self.process.kill()
+            self.process.wait()
+
+class UpdateDispatcher:
+    """Прием обновлений (long polling) и передача их процессам бота.
+
+    Обновления пользователя всегда идут одному процессу (по хэшу id), так
+    что его очередь и лимиты считаются в одном месте. Состояние диалога и
+    кэши лежат в общем хранилище, поэтому если процесс недоступен,
+    обновление получает следующий и продолжает диалог.
+    """
+
+    def __init__(self, bot, workers, poll_timeout=30):
+        self.bot = bot
+        self.workers = workers
+        self.poll_timeout = poll_timeout
+        self.running = False
+        # Последнее подтвержденное обновление сохраняется при перезапуске приема
+        self.offset = None
+
+    async def forward(self, session, update):
+        first = update_user(update) % len(self.workers)
+        for attempt in range(len(self.workers)):
+            worker = self.workers[(first + attempt) % len(self.workers)]
+            try:
+                async with session.post(worker.url, json=update,
+                                        headers={'X-Telegram-Bot-Api-Secret-Token': worker.secret}) as response:
+                    if response.status == 200:
+                        return True
+                    print(f"[CLUSTER] Процесс #{worker.index} ответил {response.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Зависший процесс (таймаут) тоже пропускаем: обновление получит следующий
+                print(f"[CLUSTER] Процесс #{worker.index} недоступен: {str(e) or 'таймаут'}")
+        return False
+
+    async def run(self):
+        self.running = True
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while self.running:
+                try:
+                    with self.bot.request_timeout(self.poll_timeout + 10):
+                        updates = await self.bot.get_updates(offset=self.offset, timeout=self.poll_timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[CLUSTER] Ошибка получения обновлений: {e}")
+                    await asyncio.sleep(5)
+                    continue
+
+                for update in updates:
+                    # Обновление подтверждается (offset) только после передачи процессу
+                    while not await self.forward(session, update.to_python()):
+                        await asyncio.sleep(1)
+                    self.offset = update.update_id + 1
+
+async def serve(workers, drop_pending):
+    bot = Bot(token=config.TELEGRAM_TOKEN,
+              server=TelegramAPIServer.from_base(config.TELEGRAM_API_URL)
+              if config.TELEGRAM_API_URL else TELEGRAM_PRODUCTION)
+    dispatcher = UpdateDispatcher(bot, workers)
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # getUpdates не работает при установленном вебхуке
+    await bot.delete_webhook(drop_pending_updates=drop_pending)
+
+    async def poll():
+        # Прием обновлений, упавший с ошибкой, перезапускается
+        while True:
+            try:
+                await dispatcher.run()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[CLUSTER] Прием обновлений остановлен ошибкой: {e!r}, перезапуск через 5 с")
+                await asyncio.sleep(5)
+
+    polling = asyncio.ensure_future(poll())
+
+    async def supervise():
+        # Упавший процесс перезапускается
+        while True:
+            await asyncio.sleep(5)
+            for worker in workers:
+                if not worker.alive():
+                    print(f"[CLUSTER] Процесс #{worker.index} завершился (код {worker.process.returncode}), перезапуск")
+                    worker.start()
+
+    supervisor = asyncio.ensure_future(supervise())
+    try:
+        await stop.wait()
+    finally:
+        print("\n[CLUSTER] Остановка: прием обновлений прекращен")
+        dispatcher.running = False
+        for task in (polling, supervisor):
+            task.cancel()
+        await asyncio.gather(polling, supervisor, return_exceptions=True)
+        await (await bot.get_session()).close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бот в нескольких процессах за одним диспетчером обновлений")
+    parser.add_argument('--workers', type=int, default=config.CLUSTER_WORKERS)
+    parser.add_argument('--base-port', type=int, default=config.CLUSTER_BASE_PORT)
+    parser.add_argument('--keep-pending', action='store_true', help="не пропускать накопившиеся обновления")
+    args = parser.parse_args(argv)
+
+    if config.STORAGE_BACKEND == 'memory':
+        # Без общего хранилища диалог не переживет перезапуск процесса
+        print("[CLUSTER] STORAGE_BACKEND=memory, используется sqlite")
+        config.STORAGE_BACKEND = 'sqlite'
+
+    # История /stats загружается один раз здесь, а не в каждом процессе
+    store = AnalyticsStore(config.ANALYTICS_DB)
+    store.backfill(config.LOG_FILE)
+    store.close()
+
+    # Общий секрет не дает посторонним слать обновления на порты процессов
+    secret = secrets.token_hex(16)
+    workers = [Worker(i, args.base_port + i, secret) for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+
+    try:
+        asyncio.run(serve(workers, drop_pending=not args.keep_pending))
+    finally:
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.wait(config.WEBHOOK_DRAIN_TIMEOUT + 15)
+        print("👋 Кластер остановлен")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
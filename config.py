@@ -4,5 +4,115 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-LOG_FILE = "logs/logs.csv"
-DATA_PATH = "data/"
\ No newline at end of file
+LOG_FILE = os.getenv("LOG_FILE", "logs/logs.csv")
+DATA_PATH = "data/"
+
+# Локальный кэш котировок
+PRICE_CACHE_DIR = os.path.join(DATA_PATH, "prices")
+PRICE_CACHE_TTL = int(os.getenv("PRICE_CACHE_TTL", 3600))  # секунды
+
+# Асинхронная загрузка данных
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", 4))
+
+# Пакетный анализ нескольких тикеров
+BATCH_MAX_TICKERS = int(os.getenv("BATCH_MAX_TICKERS", 10))
+ANALYSIS_MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_WORKERS", 4))
+
+# Источник котировок: yahoo | local | replay
+PRICE_PROVIDER = os.getenv("PRICE_PROVIDER", "yahoo")
+FIXTURES_PATH = os.getenv("FIXTURES_PATH", os.path.join(DATA_PATH, "fixtures"))
+REPLAY_HIDDEN_BARS = int(os.getenv("REPLAY_HIDDEN_BARS", 0))
+REPLAY_LATENCY = float(os.getenv("REPLAY_LATENCY", 0))  # секунды
+
+# Проверка тикеров
+SYMBOLS_FILE = os.path.join(DATA_PATH, "symbols.csv")
+SYMBOLS_REFRESH_INTERVAL = int(os.getenv("SYMBOLS_REFRESH_INTERVAL", 3600))  # секунды
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", 900))  # секунды
+
+# Кэш обученных моделей и прогнозов
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", 256))
+
+# Walk-forward оценка моделей
+WALK_FORWARD_HORIZON = int(os.getenv("WALK_FORWARD_HORIZON", 30))
+WALK_FORWARD_MIN_TRAIN = int(os.getenv("WALK_FORWARD_MIN_TRAIN", 60))
+WALK_FORWARD_STEP = int(os.getenv("WALK_FORWARD_STEP", 1))
+
+# Тяжелые модели (ARIMA, ML) в отдельных процессах
+HEAVY_MODELS_ENABLED = os.getenv("HEAVY_MODELS_ENABLED", "1") == "1"
+HEAVY_MAX_WORKERS = int(os.getenv("HEAVY_MAX_WORKERS", 2))
+HEAVY_MODEL_BUDGET = float(os.getenv("HEAVY_MODEL_BUDGET", 10))  # секунды на модель
+HEAVY_MODEL_ORIGINS = int(os.getenv("HEAVY_MODEL_ORIGINS", 2))
+ARIMA_PARAMS_PATH = os.path.join(DATA_PATH, "arima")
+
+# Отложенный импорт моделей (0 - импортировать все модели при запуске)
+LAZY_MODELS = os.getenv("LAZY_MODELS", "1") == "1"
+
+# Отсечение моделей: прерывать, если ошибка выше лучшей более чем на PRUNE_MARGIN
+PRUNE_MARGIN = float(os.getenv("PRUNE_MARGIN", 0.2))
+
+# Подбор гиперпараметров (окно скользящего среднего, порядок ARIMA) по тикерам
+HYPERPARAM_SEARCH = os.getenv("HYPERPARAM_SEARCH", "1") == "1"
+HYPERPARAMS_PATH = os.path.join(DATA_PATH, "params")
+HYPERPARAM_TTL = int(os.getenv("HYPERPARAM_TTL", 7 * 24 * 3600))  # секунды
+# Процессов для фонового подбора порядка ARIMA (отдельно от HEAVY_MAX_WORKERS)
+HYPERPARAM_SEARCH_WORKERS = int(os.getenv("HYPERPARAM_SEARCH_WORKERS", 1))
+
+# Графики: размер в дюймах, разрешение и число процессов отрисовки
+CHART_WIDTH = float(os.getenv("CHART_WIDTH", 12))
+CHART_HEIGHT = float(os.getenv("CHART_HEIGHT", 6))
+CHART_DPI = int(os.getenv("CHART_DPI", 150))
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", 2))
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", 1024))
+
+# Торговые сценарии: комиссия с каждой покупки и продажи (доля), лимит сделок (0 - без ограничения)
+STRATEGY_COST = float(os.getenv("STRATEGY_COST", 0.001))
+STRATEGY_MAX_TRADES = int(os.getenv("STRATEGY_MAX_TRADES", 0)) or None
+
+# Буферизованный лог запросов: запись пачками и ротация по размеру и дате
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", 100))  # строк
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 5))  # секунды
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_ROTATE_DAILY = os.getenv("LOG_ROTATE_DAILY", "1") == "1"
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 0))  # ротированных файлов (0 - все)
+
+# Аналитика запросов (SQLite) для команды /stats
+ANALYTICS_DB = os.path.join(DATA_PATH, "analytics.db")
+
+# Сессии пользователей: удаление неактивных
+SESSION_TTL = int(os.getenv("SESSION_TTL", 1800))  # секунды
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", 60))  # секунды
+
+# Очередь анализов: одновременные задачи, размер очереди и лимиты на пользователя
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", 2))
+QUEUE_MAX_SIZE = int(os.getenv("QUEUE_MAX_SIZE", 50))
+QUEUE_MAX_PER_USER = int(os.getenv("QUEUE_MAX_PER_USER", 1))
+USER_RATE_LIMIT = int(os.getenv("USER_RATE_LIMIT", 5))  # анализов за USER_RATE_WINDOW
+USER_RATE_WINDOW = int(os.getenv("USER_RATE_WINDOW", 60))  # секунды
+# Место в очереди сообщается не чаще раза в интервал (секунды)
+QUEUE_NOTIFY_INTERVAL = float(os.getenv("QUEUE_NOTIFY_INTERVAL", 5.0))
+
+# Сообщения о ходе анализа: не чаще одной правки за интервал (секунды)
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", 1.0))
+
+# Режим приема обновлений: polling | webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Внешний адрес бота (https://bot.example.com); если пусто, вебхук регистрируется вручную
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "127.0.0.1")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", 8080))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 30))  # секунды
+# Адрес Bot API (свой сервер или локальная заглушка для тестов); пусто - api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# Общее хранилище состояний диалогов и кэшей для нескольких процессов: memory | sqlite | redis
+# (при sqlite и redis кэши прогнозов и графиков тоже общие, в SHARED_DB)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
+SHARED_DB = os.path.join(DATA_PATH, "shared.db")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Кластер (cluster.py): диспетчер обновлений и процессы-обработчики на портах с CLUSTER_BASE_PORT
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", os.cpu_count() or 2))
+CLUSTER_BASE_PORT = int(os.getenv("CLUSTER_BASE_PORT", 8100))
+CLUSTER_WORKER = os.getenv("CLUSTER_WORKER", "")  # номер процесса, задается диспетчером
@@ -1,21 +1,56 @@
-import yfinance as yf
 import numpy as np
+import pandas as pd
 from datetime import datetime
 
+import config
+from price_cache import PriceCache, frame_to_bars
+from model_cache import prices_version
+from providers import get_provider
+from symbols import SymbolIndex, NegativeCache
+
 class DataLoader:
+    def __init__(self, provider=None, cache=None, symbol_index=None, negative_cache=None):
+        self.provider = provider or get_provider()
+        self.cache = cache or PriceCache(config.PRICE_CACHE_DIR, config.PRICE_CACHE_TTL)
+        self.symbol_index = symbol_index or SymbolIndex(config.SYMBOLS_FILE, config.SYMBOLS_REFRESH_INTERVAL)
+        self.negative_cache = negative_cache or NegativeCache(config.NEGATIVE_CACHE_TTL)
+    
+    def check_ticker(self, ticker):
+        """Быстрая проверка без обращения к сети: (известен ли тикер, похожие тикеры)"""
+        ticker = ticker.upper()
+        # Известный тикер не отклоняется, даже если недавно не загрузился
+        if self.cache.last_date(ticker) is not None or self.symbol_index.is_known(ticker):
+            return True, []
+        return False, [s for s in self.symbol_index.suggest(ticker) if s != ticker]
+    
+    def remember_missing(self, ticker):
+        """Запоминание тикера без данных. yfinance при таймауте или лимите запросов
+        не бросает исключение, а возвращает пустую таблицу, поэтому тикеры из
+        списка и из кэша котировок не запоминаются."""
+        if self.symbol_index.is_known(ticker) or self.cache.last_date(ticker) is not None:
+            return
+        self.negative_cache.add(ticker)
+    
     def download_data(self, ticker):
         try:
             print(f"Загрузка данных для {ticker}...")
             
-            # Используем yfinance для загрузки данных
-            stock = yf.Ticker(ticker)
+            # Сначала смотрим в локальный кэш
+            prices = self.load_cached(ticker)
+            if prices is not None:
+                return prices
+            
+            if ticker in self.negative_cache:
+                print(f"[SYMBOLS] {ticker} недавно не загрузился, пропускаем")
+                return None
             
             # Пробуем разные периоды
             periods = ["1y", "6mo", "3mo", "1mo"]
+            network_error = False
             
             for period in periods:
                 try:
-                    hist = stock.history(period=period)
+                    hist = self.provider.history(ticker, period=period)
                     
                     if not hist.empty and len(hist) > 20:
                         print(f"✅ Успешно загружено {len(hist)} записей (период: {period})")
@@ -35,12 +70,18 @@ class DataLoader:
                         # Проверяем, что есть данные
                         if len(prices) > 0 and not np.isnan(prices[-1]):
                             print(f"Последняя цена: {prices[-1]:.2f}")
+                            self.store(ticker, hist)
+                            self.symbol_index.add(ticker)
                             return prices
                 
                 except Exception as e:
                     print(f"⚠️ Не удалось загрузить период {period}: {e}")
+                    network_error = True
                     continue
             
+            # Ошибки сети не означают, что тикера нет - такие не запоминаем
+            if not network_error:
+                self.remember_missing(ticker)
             print(f"❌ Не удалось загрузить данные для {ticker}")
             return None
             
@@ -50,13 +91,98 @@ class DataLoader:
             traceback.print_exc()
             return None
     
+    def load_cached(self, ticker):
+        """Цены закрытия из кэша; устаревший кэш дополняется только новыми барами"""
+        bars = self.cache.load(ticker, ('date', 'close'))
+        if bars is None or len(bars) <= 20:
+            return None
+        
+        if self.cache.is_fresh(ticker):
+            print(f"[CACHE] {ticker}: {len(bars)} записей из кэша")
+            return np.array(bars['close'])
+        
+        # Запрашиваем с последней сохраненной даты: последний бар мог быть неполным
+        start = bars['date'][-1].astype(datetime)
+        bars = None
+        try:
+            hist = self.provider.history(ticker, start=start.strftime('%Y-%m-%d'))
+            added = self.cache.append(ticker, frame_to_bars(hist)) if not hist.empty else 0
+            if added == 0:
+                self.cache.touch(ticker)
+            print(f"[CACHE] {ticker}: обновлено {added} баров")
+        except Exception as e:
+            # Сеть недоступна - отдаем то, что есть в кэше
+            print(f"⚠️ Не удалось обновить кэш {ticker}: {e}")
+        
+        bars = self.cache.load(ticker, ('close',))
+        return np.array(bars['close'])
+    
+    def download_batch(self, tickers, period="1y"):
+        """Загрузка нескольких тикеров одним запросом к источнику.
+
+        Свежие данные берутся из кэша, остальные тикеры загружаются вместе.
+        Возвращает словарь {тикер: цены закрытия или None}.
+        """
+        results = {}
+        missing = []
+        
+        for ticker in tickers:
+            bars = self.cache.load(ticker, ('close',))
+            if bars is not None and len(bars) > 20 and self.cache.is_fresh(ticker):
+                results[ticker] = np.array(bars['close'])
+            elif ticker in self.negative_cache:
+                results[ticker] = None
+            else:
+                missing.append(ticker)
+        
+        if not missing:
+            return results
+        
+        print(f"[BATCH] Загрузка {len(missing)} тикеров: {', '.join(missing)}")
+        try:
+            data = self.provider.download(missing, period=period)
+        except Exception as e:
+            print(f"❌ Ошибка пакетной загрузки: {e}")
+            return dict(results, **{ticker: None for ticker in missing})
+        
+        for ticker in missing:
+            results[ticker] = None
+            hist = data.get(ticker, pd.DataFrame())
+            
+            if 'Close' in hist.columns:
+                hist = hist.dropna(subset=['Close'])
+            
+            if 'Close' in hist.columns and len(hist) > 20:
+                self.store(ticker, hist)
+                self.symbol_index.add(ticker)
+                results[ticker] = hist['Close'].values
+                print(f"✅ {ticker}: {len(hist)} записей")
+            else:
+                self.remember_missing(ticker)
+                print(f"❌ Нет данных для {ticker}")
+        
+        return results
+    
+    def data_version(self, ticker, prices):
+        """Версия данных: дата последнего бара из кэша или хэш цен"""
+        bars = self.cache.load(ticker, ('date',))
+        if bars is not None and len(bars) == len(prices):
+            return str(bars['date'][-1])
+        return prices_version(prices)
+    
+    def store(self, ticker, hist):
+        try:
+            self.cache.save(ticker, frame_to_bars(hist))
+        except Exception as e:
+            print(f"[CACHE] Ошибка записи {ticker}: {e}")
+    
     def download_data_simple(self, ticker):
         """Упрощенная версия загрузки данных"""
         try:
             print(f"[ПРОСТАЯ ЗАГРУЗКА] {ticker}...")
             
             # Прямая загрузка через download
-            data = yf.download(ticker, period="1mo", progress=False)
+            data = self.provider.download([ticker], period="1mo").get(ticker, pd.DataFrame())
             
             if data.empty:
                 print(f"❌ Нет данных для {ticker}")
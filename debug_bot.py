@@ -1,16 +1,18 @@
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 
+from providers import get_provider
+
+provider = get_provider()
+
 def test_ticker(ticker):
     print(f"\n{'='*50}")
     print(f"Тестирование тикера: {ticker}")
     print(f"{'='*50}")
     
     try:
-        # 1. Проверяем через Ticker
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        # 1. Проверяем через источник данных
+        info = provider.info(ticker)
         
         print(f"1. Информация о компании:")
         print(f"   - Название: {info.get('shortName', 'N/A')}")
@@ -19,7 +21,7 @@ def test_ticker(ticker):
         print(f"   - Валюта: {info.get('currency', 'N/A')}")
         
         # 2. Загружаем исторические данные
-        hist = stock.history(period="2y")
+        hist = provider.history(ticker, period="2y")
         
         print(f"\n2. Исторические данные:")
         print(f"   - Записей: {len(hist)}")
@@ -30,8 +32,8 @@ def test_ticker(ticker):
             print(f"   - Последняя цена: ${hist['Close'].iloc[-1]:.2f}")
         
         # 3. Пробуем через download
-        print(f"\n3. Тестирование yf.download():")
-        data = yf.download(ticker, period="1mo", progress=False)
+        print(f"\n3. Тестирование download() ({provider.title}):")
+        data = provider.download([ticker], period="1mo")[ticker]
         print(f"   - Загружено: {len(data)} записей")
         
         return True
@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+
+# Небольшая сетка порядков ARIMA (p, d, q)
+ARIMA_ORDER_GRID = [(1, 1, 0), (2, 1, 0), (5, 1, 0), (0, 1, 1), (1, 1, 1), (2, 1, 2)]
+MA_WINDOWS = range(2, 101)
+
+def search_ma_windows(prices, horizon=30, min_train=60, step=1, windows=MA_WINDOWS):
+    """RMSE скользящего среднего для всех окон сразу (walk-forward).
+
+    Для точки прогноза t и окна w прогноз m = mean(prices[t-w:t]), и
+    SSE = S2 - 2*m*S1 + h*m^2, где S1, S2 - суммы цен и их квадратов
+    на горизонте. Все суммы берутся из накопленных сумм, поэтому сетка
+    (точки × окна) считается одним векторным проходом.
+    Возвращает (лучшее окно, массив RMSE по окнам).
+    """
+    prices = np.asarray(prices, dtype=float)
+    windows = np.asarray(list(windows))
+    n = len(prices)
+
+    # Те же ограничения для коротких рядов, что и в WalkForwardEvaluator
+    horizon = min(horizon, max(1, n // 3))
+    min_train = min(min_train, max(2, n // 2), n - horizon)
+    origins = np.arange(min_train, n - horizon + 1, step)
+    if min_train < 2 or len(origins) == 0:
+        return int(windows[0]), np.full(len(windows), np.nan)
+
+    cumsum = np.concatenate([[0.0], np.cumsum(prices)])
+    cumsum_sq = np.concatenate([[0.0], np.cumsum(prices ** 2)])
+
+    # Если истории меньше окна, усредняем все доступные значения
+    effective = np.minimum(windows[None, :], origins[:, None])
+    means = (cumsum[origins][:, None] - cumsum[origins[:, None] - effective]) / effective
+
+    s1 = (cumsum[origins + horizon] - cumsum[origins])[:, None]
+    s2 = (cumsum_sq[origins + horizon] - cumsum_sq[origins])[:, None]
+    sse = s2 - 2 * means * s1 + horizon * means ** 2
+
+    rmse = np.sqrt(np.maximum(sse.sum(axis=0), 0) / (len(origins) * horizon))
+    return int(windows[np.argmin(rmse)]), rmse
+
+class HyperParamStore:
+    """Лучшие гиперпараметры по тикерам (JSON файл на тикер) со сроком годности.
+
+    Срок отсчитывается для каждого параметра отдельно с момента его записи.
+    """
+
+    def __init__(self, directory, ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.ttl = ttl
+        # Запись идет и из потоков анализа, и из event loop
+        self.lock = threading.Lock()
+
+    def path(self, ticker):
+        return os.path.join(self.directory, f"{ticker.upper()}.json")
+
+    def load(self, ticker):
+        """Файл тикера целиком: параметры и время записи каждого ('updated')"""
+        try:
+            with open(self.path(ticker), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault('updated', {})
+        return data
+
+    def get(self, ticker):
+        with self.lock:
+            data = self.load(ticker)
+        updated = data.pop('updated')
+        now = time.time()
+        return {key: value for key, value in data.items() if now - updated.get(key, 0) <= self.ttl}
+
+    def update(self, ticker, **params):
+        with self.lock:
+            data = self.load(ticker)
+            data.update(params)
+            now = time.time()
+            data['updated'].update({key: now for key in params})
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(ticker)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
@@ -1,10 +1,16 @@
 import csv
 import os
+import re
+import glob
+import asyncio
+import threading
 from datetime import datetime
 
 class Logger:
-    def __init__(self, log_file="logs/logs.csv"):
+    def __init__(self, log_file="logs/logs.csv", store=None):
         self.log_file = log_file
+        # Индексированное хранилище для /stats (AnalyticsStore), дублирует CSV
+        self.store = store
         self.ensure_log_directory()
     
     def ensure_log_directory(self):
@@ -19,19 +25,144 @@ class Logger:
                     'best_model', 'rmse', 'mape', 'profit'
                 ])
     
+    def format_row(self, user_id, ticker, amount, best_model, metrics, profit):
+        return [
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            user_id,
+            ticker,
+            amount,
+            best_model,
+            metrics.get('RMSE', 0) if metrics else 0,
+            metrics.get('MAPE', 0) if metrics else 0,
+            profit
+        ]
+    
     def log_request(self, user_id, ticker, amount, best_model, metrics, profit):
         try:
             with open(self.log_file, 'a', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow([
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    user_id,
-                    ticker,
-                    amount,
-                    best_model,
-                    metrics.get('RMSE', 0) if metrics else 0,
-                    metrics.get('MAPE', 0) if metrics else 0,
-                    profit
-                ])
+                row = self.format_row(user_id, ticker, amount, best_model, metrics, profit)
+                writer.writerow(row)
+            if self.store is not None:
+                self.store.add_rows([row])
         except Exception as e:
-            print(f"[LOGGER] Ошибка логирования: {e}")
\ No newline at end of file
+            print(f"[LOGGER] Ошибка логирования: {e}")
+
+class BufferedLogger(Logger):
+    """Логгер с буфером в памяти.
+
+    log_request только добавляет строку в буфер. Фоновая задача записывает
+    буфер в файл пачкой - когда набралось max_buffer строк или прошло
+    flush_interval секунд; запись идет в пуле потоков, вне event loop.
+    Файл ротируется по размеру и по смене даты; хранится не больше
+    backup_count ротированных файлов (0 - все).
+    """
+    
+    def __init__(self, log_file="logs/logs.csv", max_buffer=100, flush_interval=5,
+                 max_bytes=10 * 1024 * 1024, rotate_daily=True, store=None, backup_count=0):
+        super().__init__(log_file, store)
+        self.max_buffer = max_buffer
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.backup_count = backup_count
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.loop = None
+        self.wakeup = None
+        self.task = None
+    
+    def log_request(self, user_id, ticker, amount, best_model, metrics, profit):
+        row = self.format_row(user_id, ticker, amount, best_model, metrics, profit)
+        with self.lock:
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.max_buffer
+        
+        if self.task is None:
+            # Фоновая задача не запущена (скрипты, тесты) - пишем сразу
+            self.flush()
+        elif full:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+    
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.ensure_future(self.run())
+    
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.loop.run_in_executor(None, self.flush)
+    
+    async def stop(self):
+        """Остановка фоновой задачи и запись оставшихся строк"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+    
+    def flush(self):
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+        if not rows:
+            return
+        
+        try:
+            with self.write_lock:
+                self.rotate()
+                with open(self.log_file, 'a', newline='', encoding='utf-8') as f:
+                    csv.writer(f).writerows(rows)
+                if self.store is not None:
+                    self.store.add_rows(rows)
+        except Exception as e:
+            print(f"[LOGGER] Ошибка логирования: {e}")
+    
+    def rotate(self):
+        """Переименование файла в logs.<дата>.csv при переполнении или смене даты"""
+        if not os.path.exists(self.log_file):
+            self.ensure_log_directory()
+            return
+        
+        stat = os.stat(self.log_file)
+        file_date = datetime.fromtimestamp(stat.st_mtime).date()
+        if stat.st_size < self.max_bytes and not (self.rotate_daily and file_date != datetime.now().date()):
+            return
+        
+        root, ext = os.path.splitext(self.log_file)
+        day = f"{file_date:%Y-%m-%d}"
+        # Номер больше всех копий этого дня: после удаления старых копий имя не переиспользуется
+        indexes = [index for (date, index), _ in self.backups() if date == day]
+        index = max(indexes) + 1 if indexes else 0
+        target = f"{root}.{day}.{index}{ext}" if index else f"{root}.{day}{ext}"
+        os.replace(self.log_file, target)
+        print(f"[LOGGER] Ротация лога: {target}")
+        self.ensure_log_directory()
+        self.remove_old_backups()
+    
+    def backups(self):
+        """Ротированные файлы от старых к новым: [((дата, номер), путь)]"""
+        root, ext = os.path.splitext(self.log_file)
+        # Только logs.<дата>[.N].csv: логи процессов кластера (logs.worker0.csv) не трогаем
+        pattern = re.compile(re.escape(root) + r"\.(\d{4}-\d{2}-\d{2})(?:\.(\d+))?" + re.escape(ext) + "$")
+        backups = []
+        for path in glob.glob(f"{glob.escape(root)}.*{ext}"):
+            match = pattern.match(path)
+            if match:
+                backups.append(((match.group(1), int(match.group(2) or 0)), path))
+        return sorted(backups)
+    
+    def remove_old_backups(self):
+        if not self.backup_count:
+            return
+        for _, path in self.backups()[:-self.backup_count]:
+            os.remove(path)
+            print(f"[LOGGER] Удален старый лог: {path}")
@@ -0,0 +1,58 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+class ForecastCache:
+    """LRU кэш обученных моделей и прогнозов.
+
+    Ключ - (тикер, версия данных, конфигурация моделей), поэтому повторный
+    запрос того же тикера в тот же день обходится без обучения.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def __len__(self):
+        return len(self.items)
+
+class ChartCache(ForecastCache):
+    """Telegram file_id отправленных графиков.
+
+    Ключ - хэш построенных рядов и подписей, поэтому одинаковый график
+    отправляется повторно по file_id, без отрисовки и загрузки PNG.
+    """
+
+    @staticmethod
+    def key(kind, series, labels=()):
+        digest = hashlib.sha1(repr((kind, tuple(labels))).encode('utf-8'))
+        for values in series:
+            digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+            # Граница между рядами: [1, 2] + [3] и [1] + [2, 3] дают разные ключи
+            digest.update(b'|')
+        return digest.hexdigest()
+
+def prices_version(prices):
+    """Версия данных по содержимому ряда, если дата последнего бара неизвестна"""
+    return hashlib.sha1(np.ascontiguousarray(prices, dtype=np.float64).tobytes()).hexdigest()[:16]
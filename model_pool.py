@@ -0,0 +1,165 @@
+import sys
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+class ModelTimeout(Exception):
+    pass
+
+class ModelPruned(Exception):
+    pass
+
+def score_model(model, prices, horizon, origins, best=None, margin=0.0):
+    """Оценка модели на последних origins точках прогноза и обучение на всем ряде.
+
+    Выполняется в отдельном процессе. best - общий для турнира
+    multiprocessing.Value с лучшим RMSE: если уже накопленная ошибка гарантирует
+    RMSE выше best * (1 + margin), оценка прерывается.
+    """
+    start = time.perf_counter()
+    prices = np.asarray(prices, dtype=float)
+    squared = 0.0
+    relative = 0.0
+    count = 0
+
+    starts = [len(prices) - i * horizon for i in range(origins, 0, -1)]
+    starts = [origin for origin in starts if origin >= 2 * horizon]
+    total = len(starts) * horizon
+    if total == 0:
+        raise RuntimeError(f"{model.name}: недостаточно данных")
+
+    for origin in starts:
+        fitted = model.train(prices[:origin])
+        if fitted is None:
+            raise RuntimeError(f"{model.name}: не удалось обучить модель")
+        actual = prices[origin:origin + horizon]
+        errors = actual - fitted.predict(prices[:origin], steps=horizon)
+        squared += float(errors @ errors)
+        relative += float(np.sum(np.abs(errors) / np.maximum(np.abs(actual), np.finfo(np.float64).eps)))
+        count += horizon
+
+        # Оставшиеся ошибки неотрицательны, поэтому sqrt(squared / total) - нижняя граница RMSE
+        if best is not None:
+            lower_bound = np.sqrt(squared / total)
+            if lower_bound > best.value * (1 + margin):
+                raise ModelPruned(f"RMSE не ниже {lower_bound:.2f} при лучшем {best.value:.2f}")
+
+    fitted = model.train(prices)
+    if fitted is None:
+        raise RuntimeError(f"{model.name}: не удалось обучить модель")
+
+    return {
+        'RMSE': float(np.sqrt(squared / count)),
+        'MAPE': relative / count,
+        'model': fitted,
+        'fit_time': time.perf_counter() - start,
+    }
+
+def _run_job(conn, func, args):
+    try:
+        conn.send(('ok', func(*args)))
+    except ModelPruned as e:
+        conn.send(('pruned', str(e)))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+class HeavyModelPool:
+    """Пул процессов для тяжелых моделей (ARIMA, ML).
+
+    Каждая задача выполняется в своем процессе, поэтому задачу, превысившую
+    бюджет времени, можно остановить, не затрагивая остальные. Число
+    одновременных процессов ограничено max_workers; фоновые задачи
+    (background=True) идут в своих background_workers слотах и не
+    задерживают интерактивные турниры.
+    """
+
+    def __init__(self, max_workers=2, background_workers=1):
+        self.max_workers = max_workers
+        self.background_workers = background_workers
+        self.semaphore = None
+        self.background_semaphore = None
+        # Потоки только ждут результата из канала, расчеты идут в процессах
+        self.waiter = ThreadPoolExecutor(max_workers=max_workers + background_workers,
+                                         thread_name_prefix="model-wait")
+
+        # fork: процесс стартует мгновенно и наследует уже импортированные
+        # модели. На macOS и Windows fork недоступен или небезопасен
+        if sys.platform.startswith('linux'):
+            self.context = multiprocessing.get_context('fork')
+        else:
+            self.context = multiprocessing.get_context('spawn')
+
+    async def run(self, func, args, budget, background=False):
+        """Запуск func(*args) в отдельном процессе с ограничением по времени"""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_workers)
+            self.background_semaphore = asyncio.Semaphore(self.background_workers)
+
+        loop = asyncio.get_running_loop()
+        async with (self.background_semaphore if background else self.semaphore):
+            parent_conn, child_conn = self.context.Pipe(duplex=False)
+            process = self.context.Process(target=_run_job, args=(child_conn, func, args), daemon=True)
+            process.start()
+            child_conn.close()
+
+            try:
+                ready = await loop.run_in_executor(self.waiter, parent_conn.poll, budget)
+                if not ready:
+                    raise ModelTimeout(f"превышен бюджет {budget:.1f} с")
+                status, payload = await loop.run_in_executor(self.waiter, parent_conn.recv)
+            except EOFError:
+                raise RuntimeError("рабочий процесс завершился без результата")
+            finally:
+                # Останавливаем процесс и при таймауте, и при отмене запроса
+                if process.is_alive():
+                    process.kill()
+                await loop.run_in_executor(self.waiter, process.join)
+                parent_conn.close()
+
+        if status == 'pruned':
+            raise ModelPruned(payload)
+        if status == 'error':
+            raise RuntimeError(payload)
+        return payload
+
+    def shared_best(self, value=float('inf')):
+        """Лучший RMSE турнира, видимый рабочим процессам"""
+        return self.context.Value('d', value)
+
+    async def evaluate(self, models, prices, horizon=30, origins=2, best=None, margin=0.0, background=False):
+        """Параллельная оценка тяжелых моделей.
+
+        models - {имя: (модель, бюджет в секундах)}. Модели, превысившие
+        бюджет, отсеченные по best/margin или завершившиеся ошибкой,
+        в результат не попадают. background - оценка в фоновых слотах пула.
+        """
+        async def run_one(name, model, budget):
+            try:
+                result = await self.run(score_model, (model, prices, horizon, origins, best, margin),
+                                        budget, background)
+                print(f"[POOL] {name}: RMSE={result['RMSE']:.2f}, "
+                      f"MAPE={result['MAPE']:.2%}, {result['fit_time']:.1f} с")
+                if best is not None:
+                    with best.get_lock():
+                        best.value = min(best.value, result['RMSE'])
+                return name, result
+            except ModelPruned as e:
+                print(f"[POOL] {name} отсечена: {e}")
+            except ModelTimeout as e:
+                print(f"[POOL] {name} снята с турнира: {e}")
+            except Exception as e:
+                print(f"[POOL] Ошибка в модели {name}: {e}")
+            return name, None
+
+        results = await asyncio.gather(*[
+            run_one(name, model, budget) for name, (model, budget) in models.items()
+        ])
+        return {name: result for name, result in results if result is not None}
+
+    def shutdown(self):
+        self.waiter.shutdown(wait=False)
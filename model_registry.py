@@ -0,0 +1,67 @@
+import importlib
+import threading
+
+class ModelSpec:
+    """Описание модели: где лежит класс и с какими параметрами создавать"""
+
+    def __init__(self, name, path, heavy=False, **kwargs):
+        self.name = name
+        self.path = path
+        self.heavy = heavy
+        self.kwargs = kwargs
+
+    def config_key(self):
+        return (self.path, tuple(sorted(self.kwargs.items())))
+
+class ModelRegistry:
+    """Реестр моделей с отложенным импортом.
+
+    Модуль модели импортируется при первом обращении, поэтому statsmodels,
+    scikit-learn и другие тяжелые библиотеки не замедляют запуск бота.
+    Новые модели (Prophet, LSTM) добавляются через register().
+    """
+
+    def __init__(self, lazy=True):
+        self.lazy = lazy
+        self.specs = {}
+        self.classes = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, path, heavy=False, **kwargs):
+        self.specs[name] = ModelSpec(name, path, heavy, **kwargs)
+        if not self.lazy:
+            self.load(name)
+
+    def names(self, heavy=None):
+        return [name for name, spec in self.specs.items() if heavy is None or spec.heavy == heavy]
+
+    def spec(self, name):
+        return self.specs[name]
+
+    def is_loaded(self, name):
+        return name in self.classes
+
+    def load(self, name):
+        """Импорт класса модели (один раз)"""
+        with self.lock:
+            if name not in self.classes:
+                module_name, class_name = self.specs[name].path.split(':')
+                print(f"[REGISTRY] Загрузка модели {name} ({module_name})")
+                module = importlib.import_module(module_name)
+                self.classes[name] = getattr(module, class_name)
+            return self.classes[name]
+
+    def create(self, name, **overrides):
+        kwargs = dict(self.specs[name].kwargs, **overrides)
+        return self.load(name)(**kwargs)
+
+def default_registry(lazy=True, arima_params_dir=None):
+    """Модели бота"""
+    registry = ModelRegistry(lazy=lazy)
+    registry.register('Линейная модель', 'model_selector:SimpleLinearModel')
+    registry.register('Скользящее среднее', 'model_selector:MovingAverageModel', window=10)
+    registry.register('ARIMA', 'models.arima_model:ARIMAModel', heavy=True,
+                      order=(5, 1, 0), params_dir=arima_params_dir)
+    registry.register('ML модель', 'models.ml_model:MLModel', heavy=True,
+                      n_lags=5, n_estimators=100)
+    return registry
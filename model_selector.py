@@ -1,54 +1,282 @@
+import asyncio
 import numpy as np
-from sklearn.metrics import mean_squared_error, mean_absolute_percentage_error
 
-# Упрощенные модели
+import config
+from walk_forward import WalkForwardEvaluator
+from model_registry import default_registry
+from hyperparams import HyperParamStore, search_ma_windows, ARIMA_ORDER_GRID
+from model_pool import score_model
+from models.features import feature_cache as ml_feature_cache
+
+# Упрощенные модели.
+# train() не изменяет модель, а возвращает новый обученный экземпляр,
+# поэтому одну модель можно безопасно использовать из разных запросов.
 class SimpleLinearModel:
-    def __init__(self):
+    def __init__(self, slope=0, intercept=0):
         self.name = "Линейная модель"
-        self.slope = 0
-        self.intercept = 0
+        self.slope = slope
+        self.intercept = intercept
+    
+    def config_key(self):
+        return ('linear',)
     
     def train(self, train_data):
         if len(train_data) > 1:
             x = np.arange(len(train_data))
-            y = train_data
-            self.slope, self.intercept = np.polyfit(x, y, 1)
-        return self
+            slope, intercept = np.polyfit(x, train_data, 1)
+            return SimpleLinearModel(slope, intercept)
+        return SimpleLinearModel()
     
     def predict(self, last_values, steps=30):
         start_idx = len(last_values)
-        predictions = []
-        for i in range(steps):
-            pred = self.slope * (start_idx + i) + self.intercept
-            predictions.append(pred)
-        return np.array(predictions)
+        return self.slope * np.arange(start_idx, start_idx + steps) + self.intercept
 
 class MovingAverageModel:
-    def __init__(self, window=10):
+    def __init__(self, window=10, last_avg=0):
         self.name = "Скользящее среднее"
         self.window = window
-        self.last_avg = 0
+        self.last_avg = last_avg
+    
+    def config_key(self):
+        return ('moving_average', self.window)
     
     def train(self, train_data):
         if len(train_data) >= self.window:
-            self.last_avg = np.mean(train_data[-self.window:])
+            last_avg = np.mean(train_data[-self.window:])
         else:
-            self.last_avg = np.mean(train_data) if len(train_data) > 0 else 0
-        return self
+            last_avg = np.mean(train_data) if len(train_data) > 0 else 0
+        return MovingAverageModel(self.window, last_avg)
     
     def predict(self, last_values, steps=30):
         return np.full(steps, self.last_avg)
 
+def fit_linear_batch(data):
+    """МНК для каждой строки матрицы: наклоны и свободные члены"""
+    n = data.shape[1]
+    x = np.arange(n) - (n - 1) / 2
+    slopes = data @ x / (x @ x) if n > 1 else np.zeros(len(data))
+    intercepts = data.mean(axis=1) - slopes * (n - 1) / 2
+    return slopes, intercepts
+
+def batch_rmse(actual, predicted):
+    return np.sqrt(np.mean((actual - predicted) ** 2, axis=1))
+
+def batch_mape(actual, predicted):
+    # Как в sklearn: знаменатель ограничен снизу машинным эпсилоном
+    eps = np.finfo(np.float64).eps
+    return np.mean(np.abs(actual - predicted) / np.maximum(np.abs(actual), eps), axis=1)
+
 class ModelSelector:
-    def __init__(self):
-        self.models = {
-            'Линейная модель': SimpleLinearModel(),
-            'Скользящее среднее': MovingAverageModel()
+    def __init__(self, registry=None):
+        # Тяжелые модели импортируются реестром только при первом использовании
+        self.registry = registry or default_registry(
+            lazy=config.LAZY_MODELS, arima_params_dir=config.ARIMA_PARAMS_PATH
+        )
+        self.models = {name: self.registry.create(name) for name in self.registry.names(heavy=False)}
+        self.walk_forward = WalkForwardEvaluator(
+            horizon=config.WALK_FORWARD_HORIZON,
+            min_train=config.WALK_FORWARD_MIN_TRAIN,
+            step=config.WALK_FORWARD_STEP,
+            window=self.models['Скользящее среднее'].window
+        )
+        self.hyperparams = HyperParamStore(config.HYPERPARAMS_PATH, config.HYPERPARAM_TTL)
+        self.search_tasks = {}
+    
+    def config_key(self):
+        """Конфигурация турнира - часть ключа кэша обученных моделей"""
+        names = self.registry.names(heavy=False)
+        if config.HEAVY_MODELS_ENABLED:
+            names += self.registry.names(heavy=True)
+        keys = [self.registry.spec(name).config_key() for name in names]
+        return tuple(sorted(keys)) + (self.walk_forward.config_key(), ('hyperparams', config.HYPERPARAM_SEARCH))
+    
+    def load_heavy_models(self):
+        """Импорт тяжелых моделей (вызывается вне event loop перед первым турниром)"""
+        for name in self.registry.names(heavy=True):
+            self.registry.load(name)
+    
+    def heavy_candidates(self, ticker=None, prices=None, params=None):
+        """Тяжелые модели с бюджетом времени: {имя: (модель, секунды)}.
+        
+        С тикером ARIMA стартует от параметров прошлой подгонки, а признаки
+        ML модели считаются в основном процессе и дописываются только новыми
+        барами; рабочие процессы получают их через fork. params - подобранные
+        для тикера гиперпараметры.
+        """
+        params = params or {}
+        candidates = {}
+        for name in self.registry.names(heavy=True):
+            spec = self.registry.spec(name)
+            overrides = {}
+            if 'order' in spec.kwargs and params.get('arima_order'):
+                overrides['order'] = tuple(params['arima_order'])
+            candidates[name] = (self.registry.create(name, ticker=ticker, **overrides), config.HEAVY_MODEL_BUDGET)
+            if ticker and prices is not None and 'n_lags' in spec.kwargs:
+                ml_feature_cache.get(ticker, prices, spec.kwargs['n_lags'])
+        return candidates
+    
+    async def run_tournament(self, ticker, prices, heavy_pool, executor):
+        """Параллельный турнир всех моделей с отсечением проигрывающих.
+        
+        Легкие модели оцениваются в пуле потоков, тяжелые - в пуле процессов.
+        Лучший RMSE общий для всех участников: тяжелая модель прерывается,
+        как только ее накопленная ошибка превышает его на PRUNE_MARGIN.
+        """
+        loop = asyncio.get_running_loop()
+        best = heavy_pool.shared_best()
+        params = self.hyperparams.get(ticker) if config.HYPERPARAM_SEARCH else {}
+        # С тяжелыми моделями легкие дополнительно оцениваются на их точках прогноза
+        shared_origins = config.HEAVY_MODEL_ORIGINS if config.HEAVY_MODELS_ENABLED else None
+        light = loop.run_in_executor(executor, self.light_evaluate, ticker, prices, shared_origins, params)
+        
+        heavy = None
+        if config.HEAVY_MODELS_ENABLED:
+            # Первый импорт statsmodels/sklearn выполняется вне event loop
+            await loop.run_in_executor(executor, self.load_heavy_models)
+            heavy = asyncio.ensure_future(heavy_pool.evaluate(
+                self.heavy_candidates(ticker, prices, params), prices,
+                horizon=config.WALK_FORWARD_HORIZON,
+                origins=config.HEAVY_MODEL_ORIGINS,
+                best=best,
+                margin=config.PRUNE_MARGIN
+            ))
+        
+        try:
+            best_model_name, metrics = await light
+        except BaseException:
+            if heavy is not None:
+                heavy.cancel()
+            raise
+        # Граница отсечения - RMSE победителя легких моделей на тех же точках,
+        # на которых копится ошибка тяжелых
+        bound = metrics.get(best_model_name, {}).get('shared_RMSE')
+        if bound is not None:
+            with best.get_lock():
+                best.value = min(best.value, bound)
+        
+        if heavy is not None:
+            heavy_metrics = await heavy
+            metrics.update(heavy_metrics)
+            # Выбор среди легких моделей остается за walk-forward оценкой; тяжелая
+            # модель заменяет победителя, только если точнее его на тех же точках
+            if heavy_metrics and bound is not None:
+                heavy_name = self.select_best(heavy_metrics)
+                if heavy_metrics[heavy_name]['RMSE'] < bound:
+                    best_model_name = heavy_name
+            # Порядок ARIMA подбирается в фоне, результат пригодится следующим запросам
+            if config.HYPERPARAM_SEARCH and 'arima_order' not in params:
+                self.schedule_arima_search(ticker, prices, heavy_pool)
+        
+        print(f"[MODEL] Победитель турнира: {best_model_name}")
+        return best_model_name, metrics
+    
+    def light_evaluate(self, ticker, prices, shared_origins=None, params=None):
+        """Walk-forward оценка легких моделей с подбором окна скользящего среднего.
+        
+        shared_origins - число последних точек прогноза, на которых оцениваются
+        тяжелые модели: на них же считается shared_RMSE лучшей легкой модели.
+        params - сохраненные гиперпараметры тикера: окно берется из них, пока
+        не истек HYPERPARAM_TTL.
+        """
+        window = (params or {}).get('ma_window')
+        if config.HYPERPARAM_SEARCH and window is None:
+            window, _ = search_ma_windows(
+                prices,
+                horizon=self.walk_forward.horizon,
+                min_train=self.walk_forward.min_train,
+                step=self.walk_forward.step
+            )
+            print(f"[PARAMS] {ticker}: окно скользящего среднего {window}")
+            self.hyperparams.update(ticker, ma_window=window)
+        best_model_name, metrics = self.walk_forward_evaluate(prices, window)
+        if shared_origins:
+            self.score_shared_origins(metrics, best_model_name, prices, shared_origins, window)
+        return best_model_name, metrics
+    
+    def score_shared_origins(self, metrics, name, prices, origins, window=None):
+        """RMSE легкой модели name на последних origins точках прогноза - так же,
+        как score_model оценивает тяжелые модели"""
+        model = self.models.get(name)
+        if model is None:
+            return
+        if window and name == 'Скользящее среднее':
+            model = MovingAverageModel(window)
+        try:
+            result = score_model(model, prices, config.WALK_FORWARD_HORIZON, origins)
+        except RuntimeError as e:
+            print(f"[MODEL] {name}: нет общих точек прогноза ({e})")
+            return
+        metrics[name]['shared_RMSE'] = result['RMSE']
+    
+    def schedule_arima_search(self, ticker, prices, heavy_pool):
+        """Фоновый подбор порядка ARIMA, не больше одного на тикер"""
+        ticker = ticker.upper()
+        if ticker in self.search_tasks:
+            return
+        task = asyncio.ensure_future(self.search_arima_order(ticker, prices, heavy_pool))
+        self.search_tasks[ticker] = task
+        task.add_done_callback(lambda _: self.search_tasks.pop(ticker, None))
+    
+    async def search_arima_order(self, ticker, prices, heavy_pool):
+        """Оценка сетки порядков ARIMA в пуле процессов и сохранение лучшего"""
+        print(f"[PARAMS] {ticker}: подбор порядка ARIMA из {len(ARIMA_ORDER_GRID)} вариантов")
+        # Без тикера модели не перезаписывают сохраненные параметры подгонки
+        candidates = {
+            order: (self.registry.create('ARIMA', order=order), config.HEAVY_MODEL_BUDGET)
+            for order in ARIMA_ORDER_GRID
         }
-        self.best_model = None
-        self.best_model_name = None
+        try:
+            # Свои слоты пула: фоновый подбор не занимает места интерактивных турниров
+            results = await heavy_pool.evaluate(
+                candidates, prices,
+                horizon=config.WALK_FORWARD_HORIZON,
+                origins=config.HEAVY_MODEL_ORIGINS,
+                background=True
+            )
+        except Exception as e:
+            print(f"[PARAMS] Ошибка подбора ARIMA для {ticker}: {e}")
+            return None
+        if not results:
+            return None
+        
+        order = min(results, key=lambda order: results[order]['RMSE'])
+        self.hyperparams.update(ticker, arima_order=list(order))
+        print(f"[PARAMS] {ticker}: лучший порядок ARIMA {order}, RMSE={results[order]['RMSE']:.2f}")
+        return order
+    
+    @staticmethod
+    def select_best(metrics):
+        return min(metrics.items(), key=lambda x: x[1]['RMSE'])[0]
+    
+    def walk_forward_evaluate(self, prices, window=None):
+        """Выбор модели по walk-forward оценке вместо одного разбиения 80/20.
+        
+        Лучшая модель обучается на всем ряде и возвращается в metrics[name]['model'].
+        window - окно скользящего среднего вместо окна по умолчанию.
+        """
+        print(f"[MODEL] Walk-forward оценка на {len(prices)} точках")
+        metrics = self.walk_forward.evaluate(prices, window)
+        
+        if not metrics:
+            split_idx = int(len(prices) * 0.8)
+            return self.train_and_evaluate(prices[:split_idx], prices[split_idx:])
+        
+        for name, values in metrics.items():
+            print(f"[MODEL] {name}: RMSE={values['RMSE']:.2f}, MAPE={values['MAPE']:.2%} "
+                  f"({values['origins']} точек прогноза)")
+        
+        best_model_name = self.select_best(metrics)
+        model = self.models[best_model_name]
+        if window and best_model_name == 'Скользящее среднее':
+            model = MovingAverageModel(window)
+        metrics[best_model_name]['model'] = model.train(prices)
+        print(f"[MODEL] Лучшая модель: {best_model_name}")
+        
+        return best_model_name, metrics
     
     def train_and_evaluate(self, train_data, test_data):
+        """Турнир моделей. Состояние селектора не меняется: лучшая модель
+        возвращается в metrics[best_model_name]['model']."""
         metrics = {}
         
         print(f"[MODEL] Обучение моделей, train: {len(train_data)}, test: {len(test_data)}")
@@ -70,8 +298,10 @@ class ModelSelector:
                 
                 if len(predictions) > 0 and len(test_data) > 0:
                     # Рассчитываем метрики
-                    rmse = np.sqrt(mean_squared_error(test_data, predictions[:len(test_data)]))
-                    mape = mean_absolute_percentage_error(test_data, predictions[:len(test_data)])
+                    actual = np.asarray(test_data, dtype=float)[None, :]
+                    predicted = np.asarray(predictions[:len(test_data)], dtype=float)[None, :]
+                    rmse = float(batch_rmse(actual, predicted)[0])
+                    mape = float(batch_mape(actual, predicted)[0])
                     
                     metrics[name] = {
                         'RMSE': rmse,
@@ -87,14 +317,24 @@ class ModelSelector:
         
         # Выбираем лучшую модель по RMSE
         if metrics:
-            self.best_model_name = min(metrics.items(), key=lambda x: x[1]['RMSE'])[0]
-            self.best_model = metrics[self.best_model_name]['model']
-            print(f"[MODEL] Лучшая модель: {self.best_model_name}")
+            best_model_name = min(metrics.items(), key=lambda x: x[1]['RMSE'])[0]
+            print(f"[MODEL] Лучшая модель: {best_model_name}")
         else:
             print("[MODEL] Ни одна модель не сработала, использую линейную по умолчанию")
-            self.best_model_name = "Линейная модель"
-            self.best_model = SimpleLinearModel()
-            self.best_model.train(train_data)
-            metrics[self.best_model_name] = {'RMSE': 0, 'MAPE': 0, 'model': self.best_model}
+            best_model_name = "Линейная модель"
+            metrics[best_model_name] = {'RMSE': 0, 'MAPE': 0, 'model': SimpleLinearModel().train(train_data)}
+        
+        return best_model_name, metrics
+    
+    def evaluate_batch(self, batch_prices):
+        """Выбор модели для каждого тикера портфеля той же walk-forward оценкой
+        и с тем же сохраненным окном скользящего среднего, что и для одного тикера.
         
-        return self.best_model_name, metrics
\ No newline at end of file
+        Возвращает {тикер: (лучшая модель, метрики)}; лучшая модель обучена
+        на всем ряде тикера.
+        """
+        results = {}
+        for ticker, prices in batch_prices.items():
+            params = self.hyperparams.get(ticker) if config.HYPERPARAM_SEARCH else {}
+            results[ticker] = self.light_evaluate(ticker, prices, params=params)
+        return results
@@ -1,15 +1,94 @@
-def train(self, train_data):
-    try:
-        # Преобразуем в pandas Series если нужно
-        if isinstance(train_data, np.ndarray):
-            train_series = pd.Series(train_data)
-        else:
-            train_series = train_data
+import os
+import json
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+class ARIMAParamStore:
+    """Параметры последней подгонки ARIMA по тикерам (JSON файл на тикер)"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+    
+    def path(self, ticker):
+        return os.path.join(self.directory, f"{ticker.upper()}.json")
+    
+    def load(self, ticker, order):
+        try:
+            with open(self.path(ticker), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Параметры другого порядка модели не подходят
+        if tuple(data.get('order', ())) != tuple(order):
+            return None
+        return np.array(data['params'])
+    
+    def save(self, ticker, order, params):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'order': list(order), 'params': [float(p) for p in params]}, f)
+        os.replace(tmp_path, path)
+
+class ARIMAModel:
+    def __init__(self, order=(5, 1, 0), ticker=None, params_dir=None):
+        self.name = "ARIMA"
+        self.order = order
+        self.ticker = ticker
+        self.params_dir = params_dir
+        self.model = None
+        self.model_fit = None
+    
+    def config_key(self):
+        return ('arima', self.order)
+    
+    def param_store(self):
+        if self.ticker and self.params_dir:
+            return ARIMAParamStore(self.params_dir)
+        return None
+    
+    def train(self, train_data):
+        try:
+            # Преобразуем в pandas Series если нужно
+            if isinstance(train_data, np.ndarray):
+                train_series = pd.Series(train_data)
+            else:
+                train_series = train_data
+            
+            print(f"[ARIMA] Обучаю на {len(train_series)} точках")
+            fitted = ARIMAModel(self.order, self.ticker, self.params_dir)
+            fitted.model = ARIMA(train_series, order=self.order)
+            fitted.model_fit = fitted.warm_fit()
+            
+            store = self.param_store()
+            if store is not None:
+                store.save(self.ticker, self.order, fitted.model_fit.params)
+            return fitted
+        except Exception as e:
+            print(f"[ARIMA] Ошибка обучения: {e}")
+            return None
+    
+    def warm_fit(self):
+        """Подгонка с параметрами прошлого дня в качестве начальной точки.
         
-        print(f"[ARIMA] Обучаю на {len(train_series)} точках")
-        self.model = ARIMA(train_series, order=(5, 1, 0))
-        self.model_fit = self.model.fit()
-        return self
-    except Exception as e:
-        print(f"[ARIMA] Ошибка обучения: {e}")
-        return None
\ No newline at end of file
+        Ковариация параметров не считается: для прогноза она не нужна.
+        Если оптимизатор не сошелся, повторяем подгонку с нуля.
+        """
+        store = self.param_store()
+        start_params = store.load(self.ticker, self.order) if store is not None else None
+        
+        if start_params is not None:
+            try:
+                model_fit = self.model.fit(start_params=start_params, cov_type='none')
+                if (model_fit.mle_retvals or {}).get('converged', True):
+                    return model_fit
+                print(f"[ARIMA] {self.ticker}: теплый старт не сошелся, обучаю с нуля")
+            except Exception as e:
+                print(f"[ARIMA] {self.ticker}: ошибка теплого старта: {e}")
+        
+        return self.model.fit(cov_type='none')
+    
+    def predict(self, last_values, steps=30):
+        return np.asarray(self.model_fit.forecast(steps=steps))
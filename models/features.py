@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+class LagFeatures:
+    """Буфер цен и матрица признаков для одного ряда.
+
+    Признаки строки: lag_1..lag_n, скользящее среднее и std по n предыдущим
+    ценам. Матрица хранится в float32 (как ее использует RandomForest), лаги
+    заполняются из strided-представления буфера цен, а при появлении новых
+    баров считаются только новые строки. Если изменились уже накопленные
+    цены (кэш котировок переписывает последний бар), пересчитываются только
+    строки, зависящие от измененных цен.
+    """
+    
+    def __init__(self, n_lags, capacity=256):
+        self.n_lags = n_lags
+        self.n = 0
+        self.prices = np.empty(capacity)
+        self.features = np.empty((capacity, n_lags + 2), dtype=np.float32)
+    
+    def mismatch(self, series):
+        """Индекс первой цены ряда, отличной от накопленной (self.n, если начало совпадает)"""
+        m = min(len(series), self.n)
+        diff = np.flatnonzero(self.prices[:m] != series[:m])
+        return int(diff[0]) if len(diff) else self.n
+    
+    def truncated(self, n):
+        """Копия с первыми n ценами и не зависящими от остальных строками признаков.
+        
+        Буферы копируются, а не перезаписываются: выданные ранее наборы
+        (X, y) - представления старых буферов и не должны меняться.
+        """
+        copy = LagFeatures(self.n_lags, capacity=len(self.prices))
+        copy.prices[:n] = self.prices[:n]
+        rows = max(0, n - self.n_lags)
+        copy.features[:rows] = self.features[:rows]
+        copy.n = n
+        return copy
+    
+    def extend(self, values):
+        values = np.asarray(values, dtype=float)
+        old_n = self.n
+        new_n = old_n + len(values)
+        
+        if new_n > len(self.prices):
+            # Амортизированный рост буферов
+            capacity = max(new_n, 2 * len(self.prices))
+            prices = np.empty(capacity)
+            prices[:old_n] = self.prices[:old_n]
+            features = np.empty((capacity, self.n_lags + 2), dtype=np.float32)
+            features[:max(0, old_n - self.n_lags)] = self.features[:max(0, old_n - self.n_lags)]
+            self.prices, self.features = prices, features
+        
+        self.prices[old_n:new_n] = values
+        self.n = new_n
+        
+        first_row = max(0, old_n - self.n_lags)
+        last_row = new_n - self.n_lags
+        if last_row > first_row:
+            # windows[j] = prices[first_row + j : first_row + j + n_lags] - без копирования
+            windows = sliding_window_view(self.prices[first_row:new_n - 1], self.n_lags)
+            rows = self.features[first_row:last_row]
+            rows[:, :self.n_lags] = windows[:, ::-1]
+            rows[:, self.n_lags] = windows.mean(axis=1)
+            rows[:, self.n_lags + 1] = windows.std(axis=1, ddof=1)
+    
+    def dataset(self, length):
+        """(X, y) для первых length цен - представления буферов, без копий"""
+        rows = max(0, length - self.n_lags)
+        return self.features[:rows], self.prices[self.n_lags:length]
+
+class LagFeatureCache:
+    """Признаки по тикерам; новые бары дописываются к уже посчитанным"""
+    
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.series = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, ticker, prices, n_lags):
+        prices = np.asarray(prices, dtype=float)
+        key = (ticker, n_lags)
+        
+        with self.lock:
+            features = self.series.get(key)
+            if features is None:
+                features = LagFeatures(n_lags, capacity=max(256, len(prices)))
+            else:
+                # Цены с первой отличающейся пересчитываются, начало переиспользуется
+                mismatch = features.mismatch(prices)
+                if mismatch < features.n:
+                    features = features.truncated(mismatch)
+            if len(prices) > features.n:
+                features.extend(prices[features.n:])
+            
+            if ticker is not None:
+                self.series[key] = features
+                self.series.move_to_end(key)
+                while len(self.series) > self.maxsize:
+                    self.series.popitem(last=False)
+        
+        return features.dataset(len(prices))
+
+feature_cache = LagFeatureCache()
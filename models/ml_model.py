@@ -1,18 +1,39 @@
-def train(self, train_data):
-    # Преобразуем numpy array в pandas Series
-    if isinstance(train_data, np.ndarray):
-        train_series = pd.Series(train_data)
-    else:
-        train_series = train_data
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from models.features import feature_cache
+
+class MLModel:
+    def __init__(self, n_lags=5, n_estimators=100, ticker=None):
+        self.name = "ML модель"
+        self.n_lags = n_lags
+        self.n_estimators = n_estimators
+        self.ticker = ticker
+        self.model = None
     
-    df = self.create_features(train_series)
-    if len(df) < 10:
-        print("[ML] Недостаточно данных для обучения")
-        return None
+    def config_key(self):
+        return ('ml', self.n_lags, self.n_estimators)
     
-    X = df.drop('price', axis=1)
-    y = df['price']
+    def train(self, train_data):
+        X, y = feature_cache.get(self.ticker, train_data, self.n_lags)
+        if len(X) < 10:
+            print("[ML] Недостаточно данных для обучения")
+            return None
+        
+        print(f"[ML] Обучаю на {len(X)} примерах")
+        fitted = MLModel(self.n_lags, self.n_estimators, self.ticker)
+        fitted.model = RandomForestRegressor(n_estimators=self.n_estimators, random_state=42)
+        fitted.model.fit(X, y)
+        return fitted
     
-    print(f"[ML] Обучаю на {len(X)} примерах")
-    self.model.fit(X, y)
-    return self
\ No newline at end of file
+    def predict(self, last_values, steps=30):
+        """Рекурсивный прогноз: каждое предсказание становится новым лагом"""
+        history = list(last_values[-(self.n_lags + 1):])
+        predictions = []
+        for _ in range(steps):
+            window = np.array(history[-self.n_lags:])
+            features = np.concatenate([window[::-1], [window.mean(), window.std(ddof=1)]])
+            pred = self.model.predict(features.reshape(1, -1).astype(np.float32))[0]
+            predictions.append(pred)
+            history.append(pred)
+        return np.array(predictions)
@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+import numpy as np
+
+# Колонки локального хранилища: дата + OHLCV
+PRICE_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+])
+
+PRICE_COLUMNS = PRICE_DTYPE.names
+
+class Bars:
+    """Колонки котировок одного тикера: каждая колонка - отдельный массив"""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        # Срез или маска строк - для всех колонок сразу
+        return Bars({name: values[key] for name, values in self.columns.items()})
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+class PriceCache:
+    """Локальное хранилище котировок: один .npz файл на тикер, колонки хранятся
+    отдельными массивами, и чтение цен закрытия не затрагивает остальные поля"""
+
+    def __init__(self, cache_dir, ttl=3600):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, ticker):
+        return os.path.join(self.cache_dir, f"{ticker.upper()}.npz")
+
+    def load(self, ticker, columns=PRICE_COLUMNS):
+        """Колонки тикера (Bars); из файла читаются только запрошенные"""
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return Bars({name: data[name] for name in columns})
+        except Exception as e:
+            print(f"[CACHE] Поврежден файл {path}: {e}")
+            return None
+
+    def is_fresh(self, ticker):
+        """Файл считается свежим, пока не истек TTL с момента последней записи"""
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return False
+        return time.time() - os.path.getmtime(path) < self.ttl
+
+    def touch(self, ticker):
+        """Продлеваем TTL, если новых баров не появилось"""
+        path = self.path(ticker)
+        if os.path.exists(path):
+            os.utime(path, None)
+
+    def last_date(self, ticker):
+        bars = self.load(ticker, ('date',))
+        if bars is None or len(bars) == 0:
+            return None
+        return bars['date'][-1]
+
+    def save(self, ticker, bars):
+        """Атомарная запись: пишем во временный файл и подменяем"""
+        path = self.path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        columns = {name: np.ascontiguousarray(bars[name], dtype=PRICE_DTYPE[name]) for name in PRICE_COLUMNS}
+        with open(tmp_path, 'wb') as f:
+            # Без сжатия: колонка читается из архива одним блоком
+            np.savez(f, **columns)
+        os.replace(tmp_path, path)
+
+    def append(self, ticker, new_bars):
+        """Дописываем бары начиная с последней сохраненной даты.
+
+        Последний сохраненный бар перезаписывается: он мог быть получен
+        до закрытия торгового дня.
+        """
+        old_bars = self.load(ticker)
+        if old_bars is None or len(old_bars) == 0:
+            self.save(ticker, new_bars)
+            return len(new_bars)
+
+        new_bars = new_bars[new_bars['date'] >= old_bars['date'][-1]]
+        if len(new_bars) == 0:
+            return 0
+
+        keep = np.searchsorted(old_bars['date'], new_bars['date'][0])
+        merged = Bars({name: np.concatenate([old_bars[name][:keep], new_bars[name]]) for name in PRICE_COLUMNS})
+        self.save(ticker, merged)
+        return len(new_bars)
+
+def frame_to_bars(hist):
+    """Преобразование DataFrame из yfinance в массив PRICE_DTYPE (колонки доступны по имени, как у Bars)"""
+    bars = np.zeros(len(hist), dtype=PRICE_DTYPE)
+    index = hist.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    bars['date'] = index.values.astype('datetime64[D]')
+
+    for column in ('Open', 'High', 'Low', 'Close', 'Volume'):
+        if column in hist.columns:
+            bars[column.lower()] = hist[column].values
+        else:
+            bars[column.lower()] = np.nan
+
+    # Убираем строки без цены закрытия
+    return bars[~np.isnan(bars['close'])]
@@ -0,0 +1,96 @@
+import time
+import asyncio
+
+class ProgressReporter:
+    """Сообщение о ходе долгой операции с ограничением числа запросов к Telegram.
+
+    Сообщение отправляется, только если операция идет дольше min_interval,
+    а правки идут не чаще раза в min_interval: этапы, пройденные за это
+    время, объединяются в одну правку с последним состоянием. Быстрая
+    операция (например, результат из кэша) обходится без сообщения совсем.
+    """
+
+    def __init__(self, message, title, stages=(), min_interval=1.0, parse_mode='Markdown'):
+        self.message = message
+        self.title = title
+        self.stages = list(stages)
+        self.min_interval = min_interval
+        self.parse_mode = parse_mode
+        self.done = 0
+        self.status_msg = None
+        self.shown = None
+        self.last_update = time.monotonic()
+        self.closed = asyncio.Event()
+        self.task = None
+
+    def text(self):
+        if not self.stages:
+            return self.title
+        lines = [self.title, "", "Этапы:"]
+        for i, stage in enumerate(self.stages):
+            lines.append(f"{i + 1}. {stage} ✓" if i < self.done else f"{i + 1}. {stage}...")
+        return "\n".join(lines)
+
+    def start(self, done=0):
+        """Начало отсчета; первое сообщение - через min_interval, если операция не закончится раньше"""
+        self.done = done
+        self.last_update = time.monotonic()
+        self.schedule()
+        return self
+
+    def advance(self, done=None):
+        """Этап завершен (или завершено done этапов)"""
+        self.done = self.done + 1 if done is None else done
+        self.schedule()
+
+    def schedule(self):
+        if not self.closed.is_set() and (self.task is None or self.task.done()):
+            self.task = asyncio.ensure_future(self.run())
+
+    async def run(self):
+        while self.text() != self.shown:
+            delay = self.last_update + self.min_interval - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.closed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                # Даем операции дойти до следующего этапа: синхронные этапы подряд дадут одну правку
+                await asyncio.sleep(0)
+            # После закрытия правка уже не нужна
+            if self.closed.is_set():
+                return
+            await self.flush()
+
+    async def flush(self):
+        text = self.text()
+        try:
+            if self.status_msg is None:
+                self.status_msg = await self.message.answer(text, parse_mode=self.parse_mode)
+            else:
+                await self.status_msg.edit_text(text, parse_mode=self.parse_mode)
+        except Exception as e:
+            print(f"[PROGRESS] Не удалось обновить статус: {e}")
+        # Даже при ошибке не повторяем ту же правку
+        self.shown = text
+        self.last_update = time.monotonic()
+
+    async def close(self):
+        """Завершение: отложенные правки отменяются, отправленное сообщение удаляется"""
+        self.closed.set()
+        if self.task is not None:
+            # Начатый запрос доводим до конца, чтобы не потерять отправленное сообщение
+            await self.task
+        if self.status_msg is not None:
+            try:
+                await self.status_msg.delete()
+            except Exception as e:
+                print(f"[PROGRESS] Не удалось удалить статус: {e}")
+            self.status_msg = None
+
+    async def __aenter__(self):
+        return self.start(self.done)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
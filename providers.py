@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import threading
+import pandas as pd
+
+import config
+
+# Длина периодов yfinance в календарных днях
+PERIOD_DAYS = {
+    "5d": 5,
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+}
+
+class PriceProvider:
+    """Базовый источник котировок.
+
+    history() возвращает DataFrame в формате yfinance: индекс - даты,
+    колонки Open/High/Low/Close/Volume.
+    """
+    name = "base"
+    title = "Базовый источник"
+
+    def history(self, ticker, period=None, start=None):
+        raise NotImplementedError
+
+    def download(self, tickers, period="1y"):
+        """Загрузка нескольких тикеров: {тикер: DataFrame}"""
+        results = {}
+        for ticker in tickers:
+            try:
+                results[ticker] = self.history(ticker, period=period)
+            except Exception as e:
+                print(f"[PROVIDER] {ticker}: {e}")
+                results[ticker] = pd.DataFrame()
+        return results
+
+    def info(self, ticker):
+        return {'symbol': ticker}
+
+class YahooProvider(PriceProvider):
+    name = "yahoo"
+    title = "Yahoo Finance"
+
+    def history(self, ticker, period=None, start=None):
+        import yfinance as yf
+        stock = yf.Ticker(ticker)
+        if start is not None:
+            return stock.history(start=start)
+        return stock.history(period=period or "1y")
+
+    def download(self, tickers, period="1y"):
+        import yfinance as yf
+        data = yf.download(list(tickers), period=period, group_by='ticker',
+                           auto_adjust=True, progress=False, threads=True)
+
+        results = {}
+        for ticker in tickers:
+            if data.empty:
+                results[ticker] = pd.DataFrame()
+            elif isinstance(data.columns, pd.MultiIndex):
+                if ticker in data.columns.get_level_values(0):
+                    results[ticker] = data[ticker]
+                else:
+                    results[ticker] = pd.DataFrame()
+            else:
+                results[ticker] = data
+        return results
+
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+class LocalFileProvider(PriceProvider):
+    """Котировки из локальных файлов <ТИКЕР>.csv или <ТИКЕР>.parquet.
+
+    Периоды отсчитываются от последней даты в файле, поэтому записанные
+    данные не устаревают.
+    """
+    name = "local"
+    title = "Локальные файлы"
+
+    def __init__(self, fixtures_dir):
+        self.fixtures_dir = fixtures_dir
+        self.frames = {}
+        self.lock = threading.Lock()
+
+    def find_file(self, ticker):
+        for ext in (".parquet", ".csv"):
+            path = os.path.join(self.fixtures_dir, f"{ticker.upper()}{ext}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def load_frame(self, ticker):
+        path = self.find_file(ticker)
+        if path is None:
+            return pd.DataFrame()
+
+        # Файл читается один раз и перечитывается только при изменении
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            cached = self.frames.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        if path.endswith(".parquet"):
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path, index_col=0)
+        frame.index = pd.to_datetime(frame.index, utc=True).tz_localize(None)
+        frame = frame.sort_index()
+
+        with self.lock:
+            self.frames[path] = (mtime, frame)
+        return frame
+
+    def history(self, ticker, period=None, start=None):
+        frame = self.load_frame(ticker)
+        return self.slice(frame, period, start)
+
+    def slice(self, frame, period=None, start=None):
+        if frame.empty:
+            return frame
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start)]
+        if period in (None, "max"):
+            return frame
+        days = PERIOD_DAYS.get(period)
+        if days is None:
+            raise ValueError(f"Неизвестный период: {period}")
+        return frame[frame.index > frame.index[-1] - pd.Timedelta(days=days)]
+
+class ReplayProvider(LocalFileProvider):
+    """Воспроизведение записанных котировок с виртуальными часами.
+
+    Видны только бары до текущего курсора; advance() сдвигает курсор на
+    следующие торговые дни. latency имитирует задержку сети.
+    """
+    name = "replay"
+    title = "Воспроизведение записей"
+
+    def __init__(self, fixtures_dir, hidden_bars=0, latency=0.0):
+        super().__init__(fixtures_dir)
+        self.hidden_bars = hidden_bars
+        self.latency = latency
+
+    def advance(self, bars=1):
+        with self.lock:
+            self.hidden_bars = max(0, self.hidden_bars - bars)
+
+    def history(self, ticker, period=None, start=None):
+        if self.latency:
+            time.sleep(self.latency)
+        frame = self.load_frame(ticker)
+        if self.hidden_bars:
+            frame = frame.iloc[:-self.hidden_bars]
+        return self.slice(frame, period, start)
+
+PROVIDERS = {
+    YahooProvider.name: YahooProvider,
+    LocalFileProvider.name: LocalFileProvider,
+    ReplayProvider.name: ReplayProvider,
+}
+
+def get_provider(name=None):
+    """Источник котировок по имени из config.PRICE_PROVIDER"""
+    name = (name or config.PRICE_PROVIDER).lower()
+    if name == YahooProvider.name:
+        return YahooProvider()
+    if name == LocalFileProvider.name:
+        return LocalFileProvider(config.FIXTURES_PATH)
+    if name == ReplayProvider.name:
+        return ReplayProvider(config.FIXTURES_PATH,
+                              hidden_bars=config.REPLAY_HIDDEN_BARS,
+                              latency=config.REPLAY_LATENCY)
+    raise ValueError(f"Неизвестный источник данных: {name}. Доступны: {', '.join(PROVIDERS)}")
+
+def record_fixtures(tickers, fixtures_dir=None, period="2y"):
+    """Запись котировок из Yahoo в CSV для офлайн-запусков"""
+    fixtures_dir = fixtures_dir or config.FIXTURES_PATH
+    os.makedirs(fixtures_dir, exist_ok=True)
+
+    for ticker, hist in YahooProvider().download(tickers, period=period).items():
+        if hist.empty:
+            print(f"❌ Нет данных для {ticker}")
+            continue
+        path = os.path.join(fixtures_dir, f"{ticker.upper()}.csv")
+        hist.dropna(subset=['Close']).to_csv(path)
+        print(f"✅ {ticker}: {len(hist)} записей -> {path}")
+
+if __name__ == "__main__":
+    # python providers.py AAPL MSFT TSLA
+    record_fixtures([t.upper() for t in sys.argv[1:]] or ["AAPL", "MSFT", "TSLA"])
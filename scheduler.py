@@ -0,0 +1,187 @@
+import time
+import asyncio
+from collections import OrderedDict, defaultdict, deque
+
+class SchedulerRejected(Exception):
+    pass
+
+class QueueFull(SchedulerRejected):
+    pass
+
+class UserBusy(SchedulerRejected):
+    pass
+
+class RateLimited(SchedulerRejected):
+    def __init__(self, retry_after):
+        super().__init__(f"повторите через {retry_after:.0f} с")
+        self.retry_after = retry_after
+
+class FairScheduler:
+    """Очередь анализов с ограничением числа одновременных задач.
+
+    У каждого пользователя своя очередь, задачи берутся по кругу, поэтому
+    один пользователь не может занять все места. Новые задачи отклоняются,
+    если общая очередь переполнена, у пользователя уже есть max_per_user
+    задач или он превысил rate_limit запросов за rate_window секунд.
+    Место в очереди сообщается каждой задаче не чаще notify_interval
+    секунд (промежуточные места пропускаются), начало выполнения - сразу.
+    """
+
+    def __init__(self, max_workers=2, max_queue=50, max_per_user=1, rate_limit=5, rate_window=60,
+                 notify_interval=5.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.notify_interval = notify_interval
+        # Порядок ключей - очередность пользователей в круговом обходе
+        self.queues = OrderedDict()
+        self.active = defaultdict(int)
+        self.history = {}
+        self.pruned = time.monotonic()
+        self.running = 0
+
+    def queued(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def admit(self, user):
+        """Проверка перед постановкой в очередь (исключение, если задачу не принять)"""
+        now = time.monotonic()
+        if now - self.pruned >= self.rate_window:
+            self.prune_history(now)
+        history = self.history.get(user, deque())
+        while history and history[0] <= now - self.rate_window:
+            history.popleft()
+        if not history:
+            self.history.pop(user, None)
+        if len(history) >= self.rate_limit:
+            raise RateLimited(history[0] + self.rate_window - now)
+
+        if self.active.get(user, 0) + len(self.queues.get(user, ())) >= self.max_per_user:
+            raise UserBusy("предыдущий запрос еще выполняется")
+        if self.queued() >= self.max_queue:
+            raise QueueFull(f"в очереди {self.queued()} запросов")
+        history.append(now)
+        self.history[user] = history
+
+    def prune_history(self, now):
+        """Удаление истории пользователей без запросов за последние rate_window секунд"""
+        for user in [user for user, history in self.history.items()
+                     if history[-1] <= now - self.rate_window]:
+            del self.history[user]
+        self.pruned = now
+
+    async def submit(self, user, factory, on_position=None):
+        """Выполнение factory() в порядке очереди.
+
+        on_position(n) вызывается при изменении места в очереди и с n=0
+        перед началом выполнения.
+        """
+        self.admit(user)
+        job = {
+            'user': user,
+            'factory': factory,
+            'on_position': on_position,
+            'position': None,
+            'shown': None,
+            'notified': float('-inf'),
+            'started': asyncio.Event(),
+            'notifier': None,
+            'future': asyncio.get_running_loop().create_future(),
+        }
+        self.queues.setdefault(user, deque()).append(job)
+        self.dispatch()
+        self.notify()
+
+        try:
+            return await asyncio.shield(job['future'])
+        except asyncio.CancelledError:
+            # Запрос отменен до начала выполнения - освобождаем место в очереди
+            queue = self.queues.get(user)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self.queues[user]
+                self.notify()
+            raise
+
+    def dispatch(self):
+        while self.running < self.max_workers and self.queues:
+            user, queue = next(iter(self.queues.items()))
+            job = queue.popleft()
+            # Пользователь переходит в конец круга
+            del self.queues[user]
+            if queue:
+                self.queues[user] = queue
+            self.running += 1
+            self.active[user] += 1
+            asyncio.ensure_future(self.run(job))
+
+    async def run(self, job):
+        try:
+            self.report(job, 0)
+            result = await job['factory']()
+            if not job['future'].done():
+                job['future'].set_result(result)
+        except asyncio.CancelledError:
+            job['future'].cancel()
+            raise
+        except Exception as e:
+            if not job['future'].done():
+                job['future'].set_exception(e)
+        finally:
+            self.running -= 1
+            self.active[job['user']] -= 1
+            if not self.active[job['user']]:
+                del self.active[job['user']]
+            self.dispatch()
+            self.notify()
+
+    def positions(self):
+        """Место каждой ожидающей задачи при круговом обходе пользователей"""
+        lengths = [(user, len(queue)) for user, queue in self.queues.items()]
+        positions = []
+        for order, (user, queue) in enumerate(self.queues.items()):
+            for index, job in enumerate(queue):
+                # Полные круги до нашего + пользователи перед нами в текущем круге
+                ahead = sum(min(length, index) for _, length in lengths)
+                ahead += sum(1 for _, length in lengths[:order + 1] if length > index)
+                positions.append((job, ahead))
+        return positions
+
+    def notify(self):
+        for job, position in self.positions():
+            self.report(job, position)
+
+    def report(self, job, position):
+        if job['on_position'] is None:
+            return
+        job['position'] = position
+        if position == 0:
+            job['started'].set()
+        # Уведомления одной задачи идут строго по очереди (создание, правка, удаление сообщения)
+        if job['notifier'] is None or job['notifier'].done():
+            job['notifier'] = asyncio.ensure_future(self.deliver(job))
+
+    async def deliver(self, job):
+        """Отправка последнего места задачи; изменения за notify_interval объединяются"""
+        while job['position'] != job['shown']:
+            delay = job['notified'] + self.notify_interval - time.monotonic()
+            if delay > 0 and job['position'] != 0:
+                # Начало выполнения прерывает ожидание
+                try:
+                    await asyncio.wait_for(job['started'].wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            position = job['position']
+            try:
+                await job['on_position'](position)
+            except Exception as e:
+                print(f"[QUEUE] Ошибка уведомления о месте в очереди: {e}")
+            job['shown'] = position
+            job['notified'] = time.monotonic()
+
+    def stats(self):
+        return {'running': self.running, 'queued': self.queued(), 'users': len(self.queues)}
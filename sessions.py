@@ -0,0 +1,164 @@
+import time
+import pickle
+import asyncio
+import threading
+
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+class SharedPriceStore:
+    """Общие для всех пользователей ряды цен со счетчиком ссылок.
+
+    Сессия хранит только (тикер, версия данных), а сам массив существует
+    в одном экземпляре, пока на него ссылается хотя бы одна сессия.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.owners = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, owner, ticker, version, prices):
+        """Ссылка owner на ряд; возвращает общий экземпляр массива"""
+        key = (ticker, version)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                prices.flags.writeable = False
+                entry = self.entries[key] = {'prices': prices, 'owners': set()}
+            entry['owners'].add(owner)
+            self.owners.setdefault(owner, set()).add(key)
+            return entry['prices']
+
+    def get(self, ticker, version):
+        with self.lock:
+            entry = self.entries.get((ticker, version))
+            return entry['prices'] if entry is not None else None
+
+    def release(self, owner):
+        """Снятие всех ссылок сессии; ряды без ссылок удаляются"""
+        with self.lock:
+            for key in self.owners.pop(owner, ()):
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                entry['owners'].discard(owner)
+                if not entry['owners']:
+                    del self.entries[key]
+
+    def nbytes(self):
+        with self.lock:
+            return sum(entry['prices'].nbytes for entry in self.entries.values())
+
+    def __len__(self):
+        return len(self.entries)
+
+class SessionTracker:
+    """Время последней активности сессий и удаление неактивных.
+
+    Сессии MemoryStorage без активности дольше ttl секунд сбрасываются,
+    их ссылки на ряды цен снимаются, а записи удаляются из хранилища.
+    """
+
+    def __init__(self, storage, price_store, ttl=1800, sweep_interval=60):
+        self.storage = storage
+        self.price_store = price_store
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.last_seen = {}
+        self.marked = {}
+        self.task = None
+
+    async def touch(self, chat, user):
+        key = (chat, user)
+        now = time.monotonic()
+        self.last_seen[key] = now
+        # Общее хранилище: активность видна другим процессам и expire, но
+        # отмечается в базе не чаще раза в sweep_interval
+        if hasattr(self.storage, 'touch') and now - self.marked.get(key, float('-inf')) >= self.sweep_interval:
+            self.marked[key] = now
+            try:
+                await self.storage.touch(chat=chat, user=user)
+            except Exception as e:
+                print(f"[SESSIONS] Не удалось отметить активность: {e}")
+
+    async def finish(self, state):
+        """Завершение диалога: сброс состояния и снятие ссылок на данные"""
+        self.price_store.release((state.chat, state.user))
+        await state.finish()
+        self.drop_empty(state.chat, state.user)
+
+    def drop_empty(self, chat, user):
+        # reset_state в MemoryStorage оставляет пустые записи - убираем их
+        if not isinstance(getattr(self.storage, 'data', None), dict):
+            return
+        chat_key, user_key = str(chat), str(user)
+        chat_data = self.storage.data.get(chat_key, {})
+        session = chat_data.get(user_key)
+        if session is not None and session.get('state') is None and not session.get('data') \
+                and not session.get('bucket'):
+            del chat_data[user_key]
+            if not chat_data:
+                self.storage.data.pop(chat_key, None)
+
+    async def sweep(self):
+        deadline = time.monotonic() - self.ttl
+        expired = [key for key, seen in self.last_seen.items() if seen < deadline]
+        for chat, user in expired:
+            del self.last_seen[(chat, user)]
+            self.marked.pop((chat, user), None)
+            self.price_store.release((chat, user))
+            await self.storage.reset_state(chat=chat, user=user, with_data=True)
+            self.drop_empty(chat, user)
+        if hasattr(self.storage, 'expire'):
+            # Общее хранилище: сессии других процессов и сохраненные до перезапуска
+            stale = await self.storage.expire(time.time() - self.ttl)
+            for chat, user in stale:
+                self.last_seen.pop((chat, user), None)
+                self.marked.pop((chat, user), None)
+                self.price_store.release((chat, user))
+            expired += stale
+        if expired:
+            print(f"[SESSIONS] Удалено неактивных сессий: {len(expired)}, активных: {len(self.last_seen)}")
+        return len(expired)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"[SESSIONS] Ошибка очистки сессий: {e}")
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def report(self):
+        """Число сессий, средний размер состояния сессии и объем общих рядов (байты)"""
+        data = getattr(self.storage, 'data', None)
+        if isinstance(data, dict):
+            sizes = [len(pickle.dumps(session)) for chat_data in data.values() for session in chat_data.values()]
+        elif hasattr(self.storage, 'session_sizes'):
+            sizes = await self.storage.call(self.storage.session_sizes)
+        else:
+            sizes = []
+        per_session = sum(sizes) / len(sizes) if sizes else 0
+        return len(sizes), per_session, self.price_store.nbytes()
+
+class SessionMiddleware(BaseMiddleware):
+    """Отметка активности пользователя на каждом сообщении"""
+
+    def __init__(self, tracker):
+        super().__init__()
+        self.tracker = tracker
+
+    async def on_pre_process_message(self, message, data):
+        await self.tracker.touch(message.chat.id, message.from_user.id)
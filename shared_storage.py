@@ -0,0 +1,266 @@
+import os
+import copy
+import json
+import time
+import pickle
+import hashlib
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher.storage import BaseStorage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    chat TEXT NOT NULL,
+    user TEXT NOT NULL,
+    state TEXT,
+    data TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (chat, user)
+);
+CREATE INDEX IF NOT EXISTS fsm_updated ON fsm (updated);
+
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_used ON cache (namespace, used);
+"""
+
+def connect(db_path, timeout=10):
+    """Соединение с общей базой: WAL, чтобы процессы читали без блокировок.
+
+    timeout - сколько секунд ждать, пока другой процесс держит запись.
+    """
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+class SQLiteStorage(BaseStorage):
+    """FSM хранилище aiogram в SQLite.
+
+    Состояние диалога переживает перезапуск и доступно всем процессам бота
+    на этой машине, поэтому любой обработчик продолжит диалог пользователя.
+    Данные хранятся в JSON, как в RedisStorage2. Запросы идут в отдельном
+    потоке: ожидание записи другого процесса не останавливает event loop.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = connect(db_path)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-sqlite")
+
+    async def call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def address(self, chat, user):
+        return tuple(map(str, self.check_address(chat=chat, user=user)))
+
+    def load(self, chat, user):
+        row = self.connection.execute(
+            "SELECT state, data, bucket FROM fsm WHERE chat = ? AND user = ?", (chat, user)
+        ).fetchone()
+        if row is None:
+            return {'state': None, 'data': {}, 'bucket': {}}
+        return {'state': row[0], 'data': json.loads(row[1]), 'bucket': json.loads(row[2])}
+
+    def read(self, chat, user):
+        chat, user = self.address(chat, user)
+        with self.lock:
+            return self.load(chat, user)
+
+    def modify(self, chat, user, change):
+        chat, user = self.address(chat, user)
+        with self.lock, self.connection:
+            # Чтение и запись одной транзакцией: другой процесс не вклинится между ними
+            self.connection.execute("BEGIN IMMEDIATE")
+            session = self.load(chat, user)
+            change(session)
+            if session['state'] is None and not session['data'] and not session['bucket']:
+                # Завершенный диалог не хранится
+                self.connection.execute("DELETE FROM fsm WHERE chat = ? AND user = ?", (chat, user))
+            else:
+                self.connection.execute(
+                    "INSERT INTO fsm VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (chat, user) DO UPDATE SET "
+                    "state = excluded.state, data = excluded.data, bucket = excluded.bucket, "
+                    "updated = excluded.updated",
+                    (chat, user, session['state'], json.dumps(session['data']),
+                     json.dumps(session['bucket']), time.time())
+                )
+
+    async def get_state(self, *, chat=None, user=None, default=None):
+        state = (await self.call(self.read, chat, user))['state']
+        return state if state is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat=None, user=None, default=None):
+        return (await self.call(self.read, chat, user))['data']
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        await self.call(self.modify, chat, user, lambda session: session.update(state=self.resolve_state(state)))
+
+    async def set_data(self, *, chat=None, user=None, data=None):
+        await self.call(self.modify, chat, user, lambda session: session.update(data=copy.deepcopy(data or {})))
+
+    async def update_data(self, *, chat=None, user=None, data=None, **kwargs):
+        await self.call(self.modify, chat, user, lambda session: session['data'].update(data or {}, **kwargs))
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *, chat=None, user=None, default=None):
+        return (await self.call(self.read, chat, user))['bucket']
+
+    async def set_bucket(self, *, chat=None, user=None, bucket=None):
+        await self.call(self.modify, chat, user,
+                        lambda session: session.update(bucket=copy.deepcopy(bucket or {})))
+
+    async def update_bucket(self, *, chat=None, user=None, bucket=None, **kwargs):
+        await self.call(self.modify, chat, user,
+                        lambda session: session['bucket'].update(bucket or {}, **kwargs))
+
+    def mark_active(self, chat, user):
+        chat, user = self.address(chat, user)
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE fsm SET updated = ? WHERE chat = ? AND user = ?",
+                                    (time.time(), chat, user))
+
+    async def touch(self, *, chat=None, user=None):
+        """Отметка активности сессии без изменения состояния (продлевает срок до expire)"""
+        await self.call(self.mark_active, chat, user)
+
+    def delete_stale(self, before):
+        with self.lock, self.connection:
+            rows = self.connection.execute("SELECT chat, user FROM fsm WHERE updated < ?", (before,)).fetchall()
+            self.connection.execute("DELETE FROM fsm WHERE updated < ?", (before,))
+        return [(int(chat), int(user)) for chat, user in rows]
+
+    async def expire(self, before):
+        """Удаление сессий без активности с момента before (time.time()); возвращает их адреса"""
+        return await self.call(self.delete_stale, before)
+
+    def session_sizes(self):
+        """Размер сохраненного состояния каждой сессии (байты)"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT length(coalesce(state, '')) + length(data) + length(bucket) FROM fsm"
+            ).fetchall()
+        return [size for size, in rows]
+
+    def close_connection(self):
+        with self.lock:
+            self.connection.close()
+
+    async def close(self):
+        await self.call(self.close_connection)
+        self.executor.shutdown(wait=False)
+
+    async def wait_closed(self):
+        pass
+
+class SQLiteCache:
+    """Общий для процессов кэш в SQLite с тем же интерфейсом, что ForecastCache.
+
+    Значения сериализуются pickle; при переполнении удаляются записи,
+    к которым дольше всего не обращались. Из обработчиков кэш вызывается
+    через call (в отдельном потоке); блокировку базы ждем не дольше timeout
+    секунд: занятая база считается промахом, а запись пропускается.
+    """
+
+    def __init__(self, db_path, namespace, maxsize=256, timeout=0.5):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.connection = connect(db_path, timeout=timeout)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"cache-{namespace}")
+        self.hits = 0
+        self.misses = 0
+
+    async def call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    @staticmethod
+    def digest(key):
+        return key if isinstance(key, str) else hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        key = self.digest(key)
+        try:
+            with self.lock, self.connection:
+                row = self.connection.execute(
+                    "SELECT value FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+                ).fetchone()
+                if row is not None:
+                    self.connection.execute(
+                        "UPDATE cache SET used = ? WHERE namespace = ? AND key = ?",
+                        (time.time(), self.namespace, key)
+                    )
+        except sqlite3.OperationalError as e:
+            print(f"[CACHE] Общий кэш {self.namespace} недоступен: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            return pickle.loads(row[0])
+        except Exception as e:
+            print(f"[CACHE] Не удалось прочитать запись {self.namespace}: {e}")
+            return None
+
+    def put(self, key, value):
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"[CACHE] Значение не сохранено в общий кэш {self.namespace}: {e}")
+            return
+        try:
+            with self.lock, self.connection:
+                self.connection.execute(
+                    "INSERT INTO cache VALUES (?, ?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE SET "
+                    "value = excluded.value, used = excluded.used",
+                    (self.namespace, self.digest(key), blob, time.time())
+                )
+                self.connection.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key IN (SELECT key FROM cache WHERE namespace = ? "
+                    "ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                    (self.namespace, self.namespace, self.maxsize)
+                )
+        except sqlite3.OperationalError as e:
+            print(f"[CACHE] Значение не сохранено в общий кэш {self.namespace}: {e}")
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT count(*) FROM cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+def create_storage(backend, db_path=None, redis_url=None, ttl=None):
+    """FSM хранилище по названию: memory | sqlite | redis"""
+    if backend == 'sqlite':
+        return SQLiteStorage(db_path)
+    if backend == 'redis':
+        # aioredis нужен только в этом режиме
+        from aiogram.contrib.fsm_storage.redis import RedisStorage2
+        url = urlparse(redis_url)
+        return RedisStorage2(
+            host=url.hostname or 'localhost',
+            port=url.port or 6379,
+            db=int(url.path.lstrip('/') or 0),
+            password=url.password,
+            state_ttl=ttl,
+            data_ttl=ttl,
+            bucket_ttl=ttl
+        )
+    return MemoryStorage()
@@ -0,0 +1,62 @@
+"""Замер времени запуска и памяти бота с отложенным импортом моделей и без него.
+
+    python startup_benchmark.py
+"""
+import os
+import sys
+import time
+import subprocess
+
+def child():
+    """Импорт модулей бота и создание компонентов, как в bot_complete.py"""
+    start = time.perf_counter()
+    
+    import aiogram
+    import config
+    from data_loader import DataLoader
+    from async_fetcher import AsyncDataFetcher
+    from model_selector import ModelSelector
+    from model_cache import ForecastCache
+    from model_pool import HeavyModelPool
+    from visualization import Visualizer
+    from strategy import TradingStrategy
+    from logger import Logger
+    
+    DataLoader()
+    ModelSelector()
+    elapsed = time.perf_counter() - start
+    
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдает килобайты, macOS - байты
+        rss_mb = rss / 1024 / (1024 if sys.platform == 'darwin' else 1)
+    except ImportError:
+        rss_mb = float('nan')
+    
+    heavy = [name for name in ('statsmodels', 'sklearn', 'matplotlib', 'scipy') if name in sys.modules]
+    print(f"{elapsed:.3f} {rss_mb:.1f} {','.join(heavy) or '-'}")
+
+def measure(lazy, runs=3):
+    env = dict(os.environ, LAZY_MODELS="1" if lazy else "0")
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, __file__, "--child"], env=env,
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        total = time.perf_counter() - start
+        imports, rss, heavy = output.split()
+        results.append((total, float(imports), float(rss), heavy))
+    return min(results)
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+    else:
+        print(f"{'Режим':<12} {'Запуск, с':>10} {'Импорт, с':>10} {'RSS, МБ':>9}  Загружены")
+        for lazy in (True, False):
+            total, imports, rss, heavy = measure(lazy)
+            label = "lazy" if lazy else "eager"
+            print(f"{label:<12} {total:>10.2f} {imports:>10.2f} {rss:>9.1f}  {heavy}")
@@ -1,22 +1,124 @@
 import numpy as np
-from scipy.signal import argrelextrema
+
+def _trade_dp(prices, cost=0.0, max_trades=None, record=False):
+    """Оптимальная торговля всем капиталом за один проход по дням.
+
+    Считается в логарифмах: cash[k] - лог капитала без позиции после k
+    сделок, hold[k] - лог числа акций в позиции, открытой k+1-й сделкой.
+    cost - комиссия с каждой покупки и продажи (доля), число или своя для
+    каждой строки. Без ограничения на число сделок хранится одно
+    состояние, иначе max_trades + 1. Строки prices - отдельные прогнозы,
+    все считаются одновременно.
+    """
+    prices = np.atleast_2d(np.asarray(prices, dtype=float))
+    rows, n = prices.shape
+    # Линейный прогноз может уйти в ноль и ниже - такие дни считаем очень дешевыми
+    log_prices = np.log(np.maximum(prices, 1e-12))
+    log_fee = np.log1p(-np.asarray(cost, dtype=float)).reshape(-1, 1)
+
+    slots = 1 if max_trades is None else max_trades + 1
+    cash = np.full((rows, slots), -np.inf)
+    cash[:, 0] = 0.0
+    hold = np.full((rows, slots), -np.inf)
+    bought = np.zeros((n, rows, slots), dtype=bool) if record else None
+    sold = np.zeros((n, rows, slots), dtype=bool) if record else None
+
+    for t in range(n):
+        lp = log_prices[:, t:t + 1]
+        buy = cash + log_fee - lp
+        sell = hold + lp + log_fee
+        if max_trades is not None:
+            # Продажа завершает сделку: позиция k переходит в капитал k+1
+            sell = np.concatenate([np.full((rows, 1), -np.inf), sell[:, :-1]], axis=1)
+        if record:
+            bought[t] = buy > hold
+            sold[t] = sell > cash
+        hold = np.maximum(hold, buy)
+        cash = np.maximum(cash, sell)
+
+    # Не больше k сделок: лучший капитал среди 0..k
+    cash = np.maximum.accumulate(cash, axis=1)
+    return cash, bought, sold
+
+def optimal_log_returns(prices, cost=0.0, max_trades=None):
+    """Лог доходности лучшей торговли для каждого прогноза.
+
+    Для max_trades=None - вектор (прогнозы,), иначе матрица
+    (прогнозы × 0..max_trades сделок): все лимиты за один проход.
+    """
+    cash, _, _ = _trade_dp(prices, cost, max_trades)
+    return cash[:, 0] if max_trades is None else cash
+
+def optimal_profit(prices, amounts, cost=0.0, max_trades=None):
+    """Прибыль лучшей торговли: матрица (прогнозы × суммы).
+
+    Весь капитал реинвестируется, поэтому доходность не зависит от суммы
+    и суммы учитываются одним умножением.
+    """
+    growth = np.expm1(optimal_log_returns(prices, cost, max_trades))
+    if max_trades is not None:
+        growth = growth[:, -1]
+    return growth[:, None] * np.atleast_1d(np.asarray(amounts, dtype=float))[None, :]
+
+def optimal_trades(prices, cost=0.0, max_trades=None):
+    """Дни сделок лучшей торговли для одного прогноза: [(покупка, продажа), ...]"""
+    cash, bought, sold = _trade_dp(prices, cost, max_trades, record=True)
+    slot = int(np.argmax(cash[0] == cash[0, -1]))
+    holding = False
+    trades = []
+    sell_day = None
+
+    # Обратный проход по записанным решениям
+    for t in range(len(bought) - 1, -1, -1):
+        if not holding and sold[t, 0, slot]:
+            sell_day = t
+            holding = True
+            if max_trades is not None:
+                slot -= 1
+        elif holding and bought[t, 0, slot]:
+            trades.append((t, sell_day))
+            holding = False
+
+    return trades[::-1]
+
+def optimal_positions(prices, cost=0.0, max_trades=None):
+    """Позиции лучшей торговли для всех прогнозов: матрица (прогнозы × n-1),
+    True - акции держатся между закрытиями дней t и t+1"""
+    cash, bought, sold = _trade_dp(prices, cost, max_trades, record=True)
+    n, rows, _ = bought.shape
+    index = np.arange(rows)
+    slot = np.argmax(cash == cash[:, -1:], axis=1)
+    holding = np.zeros(rows, dtype=bool)
+    positions = np.zeros((rows, max(n - 1, 0)), dtype=bool)
+
+    # Тот же обратный проход, что в optimal_trades, сразу для всех строк
+    for t in range(n - 1, 0, -1):
+        sell = ~holding & sold[t, index, slot]
+        buy = holding & bought[t, index, slot]
+        holding = (holding & ~buy) | sell
+        if max_trades is not None:
+            slot = slot - sell
+        positions[:, t - 1] = holding
+
+    return positions
 
 class TradingStrategy:
-    def __init__(self, forecast_prices, initial_investment=1000):
-        self.prices = forecast_prices
+    def __init__(self, forecast_prices, initial_investment=1000, cost=0.0, max_trades=None):
+        self.prices = np.asarray(forecast_prices, dtype=float)
         self.initial_investment = initial_investment
+        self.cost = cost
+        self.max_trades = max_trades
     
     def find_extremes(self):
         """Находим локальные минимумы и максимумы"""
         if len(self.prices) < 3:
             return [], []
         
-        try:
-            minima_indices = argrelextrema(self.prices, np.less, order=1)[0]
-            maxima_indices = argrelextrema(self.prices, np.greater, order=1)[0]
-            return minima_indices.tolist(), maxima_indices.tolist()
-        except:
-            return [], []
+        # Сравнение с соседями, как argrelextrema с order=1: крайние дни не учитываются
+        middle, left, right = self.prices[1:-1], self.prices[:-2], self.prices[2:]
+        minima_indices = np.flatnonzero((middle < left) & (middle < right)) + 1
+        maxima_indices = np.flatnonzero((middle > left) & (middle > right)) + 1
+        return minima_indices.tolist(), maxima_indices.tolist()
     
     def calculate_profit(self):
         """Расчет потенциальной прибыли"""
@@ -33,6 +135,26 @@ class TradingStrategy:
         
         return profit
     
+    def optimal_trades(self):
+        """Лучший набор сделок по прогнозу с учетом комиссии и лимита сделок"""
+        return optimal_trades(self.prices, self.cost, self.max_trades)
+    
+    def scenarios(self):
+        """Сценарии: [(название, прибыль)], все лимиты сделок за один проход"""
+        if len(self.prices) < 2:
+            return []
+        
+        scenarios = [("Купить и держать", float(self.calculate_profit()))]
+        limit = self.max_trades or 3
+        by_limit = np.expm1(optimal_log_returns(self.prices, self.cost, limit)[0]) * self.initial_investment
+        scenarios.append(("Одна сделка", float(by_limit[1])))
+        if limit > 1:
+            scenarios.append((f"До {limit} сделок", float(by_limit[limit])))
+        if self.max_trades is None:
+            unlimited = np.expm1(optimal_log_returns(self.prices, self.cost)[0]) * self.initial_investment
+            scenarios.append(("Без ограничений", float(unlimited)))
+        return scenarios
+    
     def generate_recommendations(self):
         """Генерация рекомендаций"""
         minima, maxima = self.find_extremes()
@@ -54,6 +176,17 @@ class TradingStrategy:
         
         recommendations.append(f"💰 Потенциальная прибыль: ${profit:.2f} ({profit_percent:+.1f}%)")
         
+        trades = self.optimal_trades() if len(self.prices) >= 2 else []
+        if trades:
+            rec = "🔁 Лучшие сделки: "
+            rec += ", ".join([f"{buy+1}→{sell+1}" for buy, sell in trades[:3]])
+            if len(trades) > 3:
+                rec += f" и еще {len(trades) - 3}"
+            recommendations.append(rec)
+            
+            for title, scenario_profit in self.scenarios()[1:]:
+                recommendations.append(f"• {title}: ${scenario_profit:.2f}")
+        
         if not recommendations:
             recommendations.append("📊 Рекомендуется удерживать позицию")
         
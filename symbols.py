@@ -0,0 +1,157 @@
+import os
+import csv
+import time
+import difflib
+import threading
+import urllib.request
+
+import config
+
+# Списки бирж NASDAQ Trader (разделитель "|")
+LISTING_URLS = [
+    "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+]
+
+class SymbolIndex:
+    """Локальный индекс тикеров для мгновенной проверки ввода.
+
+    Строится из CSV файла (symbol,name) и перечитывается при его изменении.
+    Пока файл не загружен, проверка отключена.
+    """
+
+    def __init__(self, listing_path, refresh_interval=3600):
+        self.listing_path = listing_path
+        self.refresh_interval = refresh_interval
+        self.symbols = {}
+        self.names = {}
+        self.extra = set()
+        self.mtime = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Перечитываем файл, если он изменился с прошлой загрузки"""
+        now = time.time()
+        if not force and now - self.checked_at < self.refresh_interval:
+            return False
+        self.checked_at = now
+
+        if not os.path.exists(self.listing_path):
+            return False
+        mtime = os.path.getmtime(self.listing_path)
+        if mtime == self.mtime:
+            return False
+
+        symbols = {}
+        with open(self.listing_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                symbol = (row.get('symbol') or '').strip().upper()
+                if symbol:
+                    symbols[symbol] = (row.get('name') or '').strip()
+
+        names = {}
+        for symbol, name in symbols.items():
+            if name:
+                names.setdefault(name.upper(), symbol)
+
+        with self.lock:
+            self.symbols = symbols
+            self.names = names
+            self.mtime = mtime
+        print(f"[SYMBOLS] Загружено {len(symbols)} тикеров из {self.listing_path}")
+        return True
+
+    def is_loaded(self):
+        return bool(self.symbols)
+
+    def add(self, ticker):
+        """Тикер, для которого удалось загрузить данные, считается известным"""
+        with self.lock:
+            self.extra.add(ticker.upper())
+
+    def is_known(self, ticker):
+        self.refresh()
+        ticker = ticker.upper()
+        if ticker in self.symbols or ticker in self.extra:
+            return True
+        # Индексы (^GSPC), валюты (EURUSD=X) и иностранные биржи (SBER.ME) в списке не представлены
+        if not self.is_loaded() or not ticker.replace('-', '').isalnum():
+            return True
+        return False
+
+    def suggest(self, ticker, limit=3):
+        """Похожие тикеры: по написанию символа и по названию компании"""
+        ticker = ticker.upper()
+        matches = difflib.get_close_matches(ticker, list(self.symbols) + list(self.extra), n=limit, cutoff=0.6)
+
+        for name in difflib.get_close_matches(ticker, self.names, n=limit, cutoff=0.6):
+            symbol = self.names[name]
+            if symbol not in matches:
+                matches.append(symbol)
+        for name, symbol in self.names.items():
+            if len(matches) >= limit:
+                break
+            if name.startswith(ticker) and symbol not in matches:
+                matches.append(symbol)
+
+        return matches[:limit]
+
+class NegativeCache:
+    """Тикеры, для которых недавно не удалось получить данные"""
+
+    def __init__(self, ttl=900):
+        self.ttl = ttl
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def add(self, ticker):
+        with self.lock:
+            self.expires[ticker.upper()] = time.time() + self.ttl
+
+    def discard(self, ticker):
+        with self.lock:
+            self.expires.pop(ticker.upper(), None)
+
+    def __contains__(self, ticker):
+        ticker = ticker.upper()
+        with self.lock:
+            expires = self.expires.get(ticker)
+            if expires is None:
+                return False
+            if expires < time.time():
+                del self.expires[ticker]
+                return False
+            return True
+
+def download_listing(listing_path=None):
+    """Обновление файла тикеров из списков NASDAQ Trader"""
+    listing_path = listing_path or config.SYMBOLS_FILE
+    rows = {}
+
+    for url in LISTING_URLS:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            lines = response.read().decode('utf-8').splitlines()
+        header = lines[0].split('|')
+        symbol_col = 'Symbol' if 'Symbol' in header else 'ACT Symbol'
+        for line in lines[1:]:
+            values = dict(zip(header, line.split('|')))
+            symbol = values.get(symbol_col, '').strip()
+            # Последняя строка файла - служебная "File Creation Time"
+            if not symbol or symbol.startswith('File Creation Time') or values.get('Test Issue') == 'Y':
+                continue
+            rows[symbol.replace('.', '-')] = values.get('Security Name', '').strip()
+
+    os.makedirs(os.path.dirname(listing_path) or '.', exist_ok=True)
+    tmp_path = f"{listing_path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['symbol', 'name'])
+        for symbol in sorted(rows):
+            writer.writerow([symbol, rows[symbol]])
+    os.replace(tmp_path, listing_path)
+    print(f"✅ Сохранено {len(rows)} тикеров в {listing_path}")
+
+if __name__ == "__main__":
+    download_listing()
@@ -0,0 +1,61 @@
+import csv
+
+import pytest
+
+from analytics import AnalyticsStore
+
+ROWS = [
+    ('2025-01-01 10:00:00', 1, 'AAPL', 100, 'Линейная модель', 2.0, 0.02, 10),
+    ('2025-01-01 11:00:00', 1, 'AAPL', 300, 'Скользящее среднее', 4.0, 0.04, -5),
+    ('2025-01-02 09:00:00', 2, 'MSFT', 200, 'Линейная модель', 6.0, 0.06, 20),
+]
+
+@pytest.fixture
+def store(tmp_path):
+    store = AnalyticsStore(str(tmp_path / "analytics.db"))
+    yield store
+    store.close()
+
+def check_stats(stats):
+    assert stats['users'] == 2
+    assert stats['requests'] == 3
+    assert stats['total_profit'] == pytest.approx(25)
+    assert stats['tickers'] == [('AAPL', 2, 5.0), ('MSFT', 1, 20.0)]
+
+    models = {name: (wins, rmse, mape) for name, wins, rmse, mape in stats['models']}
+    assert models['Линейная модель'] == (2, pytest.approx(4.0), pytest.approx(0.04))
+    assert models['Скользящее среднее'] == (1, pytest.approx(4.0), pytest.approx(0.04))
+    assert stats['user'] == (2, 400.0, 5.0, '2025-01-01 11:00:00')
+
+def test_upserts_across_batches(store):
+    # Пачки логгера: агрегаты складываются с уже накопленными
+    store.add_rows(ROWS[:1])
+    store.add_rows(ROWS[1:])
+    check_stats(store.stats(user_id=1))
+
+def test_rebuild_matches_upserts(store):
+    store.add_rows(ROWS, update_stats=False)
+    assert store.stats()['requests'] == 0
+    store.rebuild_stats()
+    check_stats(store.stats(user_id=1))
+
+def test_backfill_from_csv(store, tmp_path):
+    log_file = tmp_path / "logs.csv"
+    rotated = tmp_path / "logs.2025-01-01.csv"
+    header = ['timestamp', 'user_id', 'ticker', 'amount', 'best_model', 'rmse', 'mape', 'profit']
+    for path, rows in ((rotated, ROWS[:2]), (log_file, ROWS[2:])):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    assert store.backfill(str(log_file)) == 3
+    check_stats(store.stats(user_id=1))
+    # Повторно база не заполняется
+    assert store.backfill(str(log_file)) == 0
+
+def test_bad_numbers_and_limit(store):
+    store.add_rows([('2025-01-03', 'x', 'TSLA', 'n/a', 'ARIMA', '', None, '1.5')])
+    stats = store.stats(user_id=0, limit=1)
+    assert stats['tickers'] == [('TSLA', 1, 1.5)]
+    assert stats['user'][:3] == (1, 0.0, 1.5)
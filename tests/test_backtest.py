@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+import pytest
+
+from backtest import backtest_ticker
+
+# Окно 2, горизонт 3: точки прогноза 2 и 5.
+# Эпизод 1: тренд 1→2 продолжается, факт 4→8→16 (доход x4).
+# Эпизод 2: тренд 8→16 продолжается, факт 8→4→2 (убыток x1/4).
+PRICES = [1, 2, 4, 8, 16, 8, 4, 2]
+
+def result(frame, model, cost):
+    rows = frame[(frame['model'] == model) & (frame['cost'] == cost)]
+    assert len(rows) == 1
+    return rows.iloc[0]
+
+@pytest.fixture(scope='module')
+def frame():
+    return backtest_ticker(PRICES, horizons=(3,), windows=(2,), costs=(0.0, 0.01))
+
+def test_linear_model_without_cost(frame):
+    row = result(frame, 'Линейная модель', 0.0)
+    assert row['episodes'] == 2
+    assert row['trades'] == 2
+    # ln 4 - ln 4 = 0: капитал вернулся к исходному
+    assert row['pnl'] == pytest.approx(0.0, abs=1e-12)
+    assert row['hit_rate'] == pytest.approx(0.5)
+    # Пик x4, затем x1: просадка 75%
+    assert row['max_drawdown'] == pytest.approx(0.75)
+    assert row['buy_and_hold'] == pytest.approx(2 / 4 - 1)
+
+def test_linear_model_with_cost(frame):
+    row = result(frame, 'Линейная модель', 0.01)
+    assert row['trades'] == 2
+    # Две сделки, у каждой комиссия при покупке и продаже
+    assert row['pnl'] == pytest.approx(0.99 ** 4 - 1)
+    peak = 4 * 0.99 ** 2
+    assert row['max_drawdown'] == pytest.approx(1 - 0.99 ** 4 / peak)
+
+def test_flat_forecast_never_trades(frame):
+    row = result(frame, 'Скользящее среднее', 0.0)
+    assert row['trades'] == 0
+    assert row['pnl'] == 0.0
+    assert row['max_drawdown'] == 0.0
+    assert math.isnan(row['hit_rate'])
+
+def test_grid_shape_and_short_history():
+    frame = backtest_ticker(np.linspace(10, 20, 120), horizons=(10, 20), windows=(5, 10), costs=(0, 0.001))
+    assert len(frame) == 2 * 2 * 2 * 2
+    assert backtest_ticker(PRICES, horizons=(30,), windows=(2,)).empty
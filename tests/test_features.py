@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from models.features import LagFeatureCache, LagFeatures
+
+def fresh(prices, n_lags):
+    features = LagFeatures(n_lags)
+    features.extend(prices)
+    return features.dataset(len(prices))
+
+def series(n, seed=0):
+    return 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, n))
+
+def assert_same(actual, expected):
+    np.testing.assert_array_equal(actual[0], expected[0])
+    np.testing.assert_array_equal(actual[1], expected[1])
+
+def test_fresh_build_rows():
+    prices = np.arange(1.0, 8.0)
+    X, y = fresh(prices, 3)
+    assert X.shape == (4, 5)
+    np.testing.assert_array_equal(X[0, :3], [3, 2, 1])
+    assert X[0, 3] == pytest.approx(2.0)
+    assert X[0, 4] == pytest.approx(1.0)
+    np.testing.assert_array_equal(y, [4, 5, 6, 7])
+
+@pytest.mark.parametrize("n_lags", [2, 5, 10])
+def test_extension_with_new_bars(n_lags):
+    prices = series(400)
+    cache = LagFeatureCache()
+    cache.get('AAPL', prices[:300], n_lags)
+    assert_same(cache.get('AAPL', prices, n_lags), fresh(prices, n_lags))
+
+@pytest.mark.parametrize("n_lags", [2, 5, 10])
+def test_last_bar_revision(n_lags):
+    prices = series(300)
+    cache = LagFeatureCache()
+    old_X, old_y = cache.get('AAPL', prices, n_lags)
+    old_X, old_y = old_X.copy(), old_y.copy()
+    stored = cache.series[('AAPL', n_lags)]
+
+    # Внутридневное обновление: последний бар переписан и добавлены новые
+    revised = np.concatenate([prices[:-1], [prices[-1] + 1.5], series(5, seed=1)])
+    assert_same(cache.get('AAPL', revised, n_lags), fresh(revised, n_lags))
+    # Ранее выданный набор не изменился
+    assert_same(stored.dataset(len(prices)), (old_X, old_y))
+
+def test_revision_in_the_middle_and_shorter_series():
+    prices = series(200)
+    cache = LagFeatureCache()
+    cache.get('AAPL', prices, 5)
+    revised = prices[:150].copy()
+    revised[120] += 3
+    assert_same(cache.get('AAPL', revised, 5), fresh(revised, 5))
+    assert_same(cache.get('AAPL', prices[:100], 5), fresh(prices[:100], 5))
+
+def test_revision_reuses_prefix():
+    features = LagFeatures(5)
+    features.extend(series(300))
+    revised = features.prices[:300].copy()
+    revised[-1] += 1
+    assert features.mismatch(revised) == 299
+    assert features.mismatch(revised[:200]) == 300
+    truncated = features.truncated(299)
+    assert truncated.n == 299
+    np.testing.assert_array_equal(truncated.features[:294], features.features[:294])
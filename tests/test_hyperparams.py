@@ -0,0 +1,38 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from hyperparams import HyperParamStore, search_ma_windows
+from walk_forward import WalkForwardEvaluator
+
+@pytest.mark.parametrize("n, horizon, min_train, step", [
+    (300, 30, 60, 1),
+    (250, 20, 60, 3),
+    (90, 30, 60, 1),
+    (40, 30, 60, 2),
+])
+def test_search_matches_walk_forward(n, horizon, min_train, step):
+    prices = 100 + np.cumsum(np.random.default_rng(n).normal(0, 1, n))
+    windows = [2, 3, 5, 10, 20, 50, 100]
+    best, rmse = search_ma_windows(prices, horizon=horizon, min_train=min_train, step=step, windows=windows)
+    evaluator = WalkForwardEvaluator(horizon=horizon, min_train=min_train, step=step)
+    expected = [evaluator.evaluate(prices, window)['Скользящее среднее']['RMSE'] for window in windows]
+    np.testing.assert_allclose(rmse, expected, rtol=1e-10)
+    assert best == windows[int(np.argmin(expected))]
+
+def test_store_expires_each_parameter(tmp_path):
+    store = HyperParamStore(str(tmp_path), ttl=60)
+    assert store.get('aapl') == {}
+    store.update('aapl', ma_window=5)
+    store.update('AAPL', arima_order=[1, 1, 0])
+    assert store.get('AAPL') == {'ma_window': 5, 'arima_order': [1, 1, 0]}
+
+    # Окно записано давно, порядок ARIMA - только что
+    data = store.load('AAPL')
+    data['updated']['ma_window'] = time.time() - 120
+    with open(store.path('AAPL'), 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    assert store.get('AAPL') == {'arima_order': [1, 1, 0]}
+    assert list(tmp_path.iterdir()) == [tmp_path / 'AAPL.json']
@@ -0,0 +1,61 @@
+import os
+import asyncio
+import datetime as dt
+
+from logger import BufferedLogger
+
+def log_rows(logger, count):
+    for i in range(count):
+        logger.log_request(user_id=i, ticker='AAPL', amount=100, best_model='Линейная модель',
+                           metrics={'RMSE': 1.0, 'MAPE': 0.01}, profit=5)
+
+def rotated(log_dir):
+    return sorted(name for name in os.listdir(log_dir) if name != 'logs.csv')
+
+def test_size_rotation_keeps_backup_count(tmp_path):
+    log_file = tmp_path / "logs.csv"
+    # Без фоновой задачи каждая строка пишется сразу, файл переполняется каждые несколько строк
+    logger = BufferedLogger(str(log_file), max_bytes=200, rotate_daily=False, backup_count=3)
+    # Лог другого процесса кластера рядом не удаляется
+    (tmp_path / "logs.worker0.csv").write_text("timestamp\n")
+    log_rows(logger, 40)
+
+    today = dt.date.today().strftime('%Y-%m-%d')
+    backups = rotated(tmp_path)
+    assert "logs.worker0.csv" in backups
+    backups.remove("logs.worker0.csv")
+    assert len(backups) == 3
+    assert all(name.startswith(f"logs.{today}") for name in backups)
+    # Остались самые новые копии
+    indexes = sorted(int(name.split('.')[2]) if name.count('.') == 3 else 0 for name in backups)
+    assert indexes[0] > 3
+    assert os.path.getsize(log_file) < 200 + 100
+
+def test_unlimited_backups_and_daily_rotation(tmp_path):
+    log_file = tmp_path / "logs.csv"
+    logger = BufferedLogger(str(log_file), max_bytes=10 ** 6, rotate_daily=True)
+    log_rows(logger, 1)
+    # Файл вчерашний: следующая запись уходит в новый
+    yesterday = dt.datetime.now() - dt.timedelta(days=1)
+    os.utime(log_file, (yesterday.timestamp(), yesterday.timestamp()))
+    log_rows(logger, 1)
+
+    assert rotated(tmp_path) == [f"logs.{yesterday:%Y-%m-%d}.csv"]
+    with open(log_file, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+
+def test_buffer_flushed_on_stop(tmp_path):
+    log_file = tmp_path / "logs.csv"
+    logger = BufferedLogger(str(log_file), max_buffer=100, flush_interval=60)
+
+    async def scenario():
+        await logger.start()
+        log_rows(logger, 5)
+        with open(log_file, encoding='utf-8') as f:
+            before = len(f.readlines())
+        await logger.stop()
+        return before
+
+    assert asyncio.run(scenario()) == 1
+    with open(log_file, encoding='utf-8') as f:
+        assert len(f.readlines()) == 6
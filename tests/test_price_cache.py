@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from price_cache import PRICE_DTYPE, PriceCache
+
+def make_bars(start, closes):
+    bars = np.zeros(len(closes), dtype=PRICE_DTYPE)
+    bars['date'] = np.arange(np.datetime64(start), np.datetime64(start) + len(closes))
+    bars['close'] = closes
+    bars['open'] = bars['high'] = bars['low'] = closes
+    bars['volume'] = 1000
+    return bars
+
+@pytest.fixture
+def cache(tmp_path):
+    return PriceCache(str(tmp_path))
+
+def test_round_trip_and_column_subset(cache):
+    cache.save('aapl', make_bars('2024-01-01', [1.0, 2.0, 3.0]))
+    bars = cache.load('AAPL')
+    assert len(bars) == 3
+    np.testing.assert_array_equal(bars['close'], [1, 2, 3])
+    assert bars['date'][-1] == np.datetime64('2024-01-03')
+
+    closes = cache.load('AAPL', ('close',))
+    assert list(closes.columns) == ['close']
+    assert cache.last_date('AAPL') == np.datetime64('2024-01-03')
+    assert cache.load('MSFT') is None
+
+def test_append_rewrites_last_bar(cache):
+    cache.save('AAPL', make_bars('2024-01-01', [1.0, 2.0, 3.0]))
+    # Последний бар был получен до закрытия дня: новые данные начинаются с него
+    added = cache.append('AAPL', make_bars('2024-01-03', [3.5, 4.0]))
+    bars = cache.load('AAPL')
+    assert added == 2
+    np.testing.assert_array_equal(bars['close'], [1, 2, 3.5, 4])
+    np.testing.assert_array_equal(bars['date'], np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-05')))
+
+def test_append_overlap_merge(cache):
+    cache.save('AAPL', make_bars('2024-01-01', [1.0, 2.0, 3.0, 4.0]))
+    # Источник вернул бары с запасом: более ранние, чем последний сохраненный, отбрасываются
+    added = cache.append('AAPL', make_bars('2024-01-02', [20.0, 30.0, 40.0, 50.0]))
+    bars = cache.load('AAPL')
+    assert added == 2
+    np.testing.assert_array_equal(bars['close'], [1, 2, 3, 40, 50])
+    assert len(np.unique(bars['date'])) == len(bars)
+
+def test_append_without_new_bars(cache):
+    cache.save('AAPL', make_bars('2024-01-05', [1.0, 2.0]))
+    assert cache.append('AAPL', make_bars('2024-01-01', [9.0, 9.0])) == 0
+    np.testing.assert_array_equal(cache.load('AAPL')['close'], [1, 2])
+
+def test_append_to_empty_cache(cache):
+    assert cache.append('AAPL', make_bars('2024-01-01', [1.0, 2.0])) == 2
+    np.testing.assert_array_equal(cache.load('AAPL')['close'], [1, 2])
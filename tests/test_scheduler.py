@@ -0,0 +1,99 @@
+import asyncio
+import random
+from collections import OrderedDict, deque
+
+import pytest
+
+from scheduler import FairScheduler, QueueFull, RateLimited, UserBusy
+
+def make_queues(lengths):
+    queues = OrderedDict()
+    for user, length in enumerate(lengths):
+        if length:
+            queues[user] = deque({'user': user, 'index': i} for i in range(length))
+    return queues
+
+def round_robin(queues):
+    """Порядок выполнения, как в dispatch: первая задача первого пользователя, он - в конец круга"""
+    queues = OrderedDict((user, deque(queue)) for user, queue in queues.items())
+    order = []
+    while queues:
+        user, queue = next(iter(queues.items()))
+        order.append(queue.popleft())
+        del queues[user]
+        if queue:
+            queues[user] = queue
+    return order
+
+@pytest.mark.parametrize("lengths", [[1], [3], [1, 1, 1], [2, 1, 3], [0, 4, 1, 2], [5, 5]])
+def test_positions_follow_dispatch_order(lengths):
+    scheduler = FairScheduler()
+    scheduler.queues = make_queues(lengths)
+    positions = {id(job): position for job, position in scheduler.positions()}
+    expected = {id(job): position for position, job in enumerate(round_robin(scheduler.queues), 1)}
+    assert positions == expected
+
+def test_positions_random_queues():
+    rng = random.Random(0)
+    for _ in range(200):
+        scheduler = FairScheduler()
+        scheduler.queues = make_queues([rng.randint(0, 4) for _ in range(rng.randint(1, 6))])
+        positions = {id(job): position for job, position in scheduler.positions()}
+        expected = {id(job): position for position, job in enumerate(round_robin(scheduler.queues), 1)}
+        assert positions == expected
+
+def test_positions_empty():
+    assert FairScheduler().positions() == []
+
+def test_admit_limits():
+    scheduler = FairScheduler(max_queue=1, max_per_user=1, rate_limit=2, rate_window=60)
+    scheduler.admit(1)
+    scheduler.queues = make_queues([0, 1])
+    with pytest.raises(UserBusy):
+        scheduler.admit(1)
+    with pytest.raises(QueueFull):
+        scheduler.admit(2)
+
+    scheduler = FairScheduler(rate_limit=2, rate_window=60)
+    scheduler.admit(1)
+    scheduler.admit(1)
+    with pytest.raises(RateLimited) as error:
+        scheduler.admit(1)
+    assert 0 < error.value.retry_after <= 60
+
+def test_idle_history_removed():
+    scheduler = FairScheduler(rate_limit=5, rate_window=60)
+    scheduler.admit(1)
+    scheduler.admit(2)
+    scheduler.history[1] = deque([scheduler.history[1][0] - 120])
+    scheduler.pruned -= 120
+    scheduler.admit(3)
+    assert set(scheduler.history) == {2, 3}
+
+def test_jobs_run_in_order_and_notify_start():
+    async def scenario():
+        scheduler = FairScheduler(max_workers=1, max_queue=10, rate_limit=10, notify_interval=60)
+        started = []
+        shown = {}
+
+        def job(user):
+            async def run():
+                started.append(user)
+                await asyncio.sleep(0.01)
+            return run
+
+        def on_position(user):
+            async def callback(position):
+                shown.setdefault(user, []).append(position)
+            return callback
+
+        await asyncio.gather(*[scheduler.submit(user, job(user), on_position(user)) for user in range(4)])
+        await asyncio.sleep(0)
+        return started, shown
+
+    started, shown = asyncio.run(scenario())
+    assert started == [0, 1, 2, 3]
+    # Правки места копятся в интервале, начало выполнения приходит сразу
+    for user, positions in shown.items():
+        assert positions[-1] == 0
+        assert len(positions) <= 2
@@ -0,0 +1,139 @@
+import time
+import asyncio
+
+import pytest
+
+from shared_storage import SQLiteCache, SQLiteStorage
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "shared.db")
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_state_data_bucket_round_trip(db_path):
+    async def scenario():
+        storage = SQLiteStorage(db_path)
+        await storage.set_state(chat=1, user=2, state='UserState:waiting_amount')
+        await storage.set_data(chat=1, user=2, data={'ticker': 'AAPL', 'data_version': 'abc'})
+        await storage.update_data(chat=1, user=2, data={'current_price': 187.5}, amount=100)
+        await storage.set_bucket(chat=1, user=2, bucket={'hits': [1, 2]})
+        await storage.update_bucket(chat=1, user=2, extra=True)
+        await storage.close()
+
+        # Новое соединение - как другой процесс или перезапуск бота
+        storage = SQLiteStorage(db_path)
+        result = (await storage.get_state(chat=1, user=2),
+                  await storage.get_data(chat=1, user=2),
+                  await storage.get_bucket(chat=1, user=2),
+                  await storage.get_state(chat=1, user=3, default='none'))
+        await storage.close()
+        return result
+
+    state, data, bucket, other = run(scenario())
+    assert state == 'UserState:waiting_amount'
+    assert data == {'ticker': 'AAPL', 'data_version': 'abc', 'current_price': 187.5, 'amount': 100}
+    assert bucket == {'hits': [1, 2], 'extra': True}
+    assert other == 'none'
+
+def test_set_data_copies_value(db_path):
+    async def scenario():
+        storage = SQLiteStorage(db_path)
+        data = {'tickers': ['AAPL']}
+        await storage.set_data(chat=1, user=1, data=data)
+        data['tickers'].append('MSFT')
+        result = await storage.get_data(chat=1, user=1)
+        await storage.close()
+        return result
+
+    assert run(scenario()) == {'tickers': ['AAPL']}
+
+def test_finished_session_removed(db_path):
+    async def scenario():
+        storage = SQLiteStorage(db_path)
+        await storage.set_state(chat=1, user=1, state='UserState:waiting_ticker')
+        await storage.set_data(chat=1, user=1, data={'ticker': 'AAPL'})
+        sizes = storage.session_sizes()
+        await storage.finish(chat=1, user=1)
+        result = (sizes, storage.session_sizes(), await storage.get_data(chat=1, user=1))
+        await storage.close()
+        return result
+
+    before, after, data = run(scenario())
+    assert len(before) == 1 and before[0] > 0
+    assert after == []
+    assert data == {}
+
+def test_expire_keeps_touched_sessions(db_path):
+    async def scenario():
+        storage = SQLiteStorage(db_path)
+        await storage.set_state(chat=1, user=1, state='UserState:waiting_ticker')
+        await storage.set_state(chat=2, user=2, state='UserState:waiting_ticker')
+        cutoff = time.time()
+        await asyncio.sleep(0.01)
+        # Активность без изменения состояния продлевает сессию
+        await storage.touch(chat=2, user=2)
+        expired = await storage.expire(cutoff + 0.005)
+        result = (expired, await storage.get_state(chat=2, user=2))
+        await storage.close()
+        return result
+
+    expired, state = run(scenario())
+    assert expired == [(1, 1)]
+    assert state == 'UserState:waiting_ticker'
+
+def test_cache_round_trip_and_eviction(db_path):
+    cache = SQLiteCache(db_path, 'forecast', maxsize=2)
+    other = SQLiteCache(db_path, 'chart', maxsize=2)
+    cache.put(('AAPL', 'v1', 'cfg'), ('MA', {'RMSE': 1.0}, [1.0, 2.0]))
+    other.put('AAPL', 'file-id')
+    assert cache.get(('AAPL', 'v1', 'cfg')) == ('MA', {'RMSE': 1.0}, [1.0, 2.0])
+    assert cache.get(('AAPL', 'v2', 'cfg')) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    time.sleep(0.01)
+    cache.put('b', 2)
+    time.sleep(0.01)
+    cache.get(('AAPL', 'v1', 'cfg'))
+    time.sleep(0.01)
+    cache.put('c', 3)
+    # Вытесняется запись, к которой дольше всего не обращались
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+    assert other.get('AAPL') == 'file-id'
+
+def test_cache_busy_database_is_miss(db_path):
+    cache = SQLiteCache(db_path, 'forecast', timeout=0.05)
+    cache.put('key', 1)
+    writer = SQLiteCache(db_path, 'forecast').connection
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        cache.put('other', 2)
+        assert cache.get('key') is None
+        assert time.monotonic() - started < 1
+    finally:
+        writer.rollback()
+    assert cache.get('key') == 1
+    assert cache.get('other') is None
+
+def test_calls_run_off_the_event_loop(db_path):
+    import threading
+
+    async def scenario():
+        cache = SQLiteCache(db_path, 'chart')
+        storage = SQLiteStorage(db_path)
+        await storage.set_data(chat=1, user=1, data={'ticker': 'AAPL'})
+        await cache.call(cache.put, 'key', 'file-id')
+        threads = {await cache.call(lambda: threading.current_thread().name),
+                   await storage.call(lambda: threading.current_thread().name)}
+        result = (await cache.call(cache.get, 'key'), await storage.call(storage.session_sizes), threads)
+        await storage.close()
+        return result
+
+    value, sizes, threads = run(scenario())
+    assert value == 'file-id'
+    assert len(sizes) == 1
+    assert threading.current_thread().name not in threads
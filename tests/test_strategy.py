@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+import pytest
+
+from strategy import optimal_log_returns, optimal_positions, optimal_trades
+
+def all_trade_sets(n, start=0):
+    """Все наборы непересекающихся сделок (покупка < продажа < следующая покупка)"""
+    yield []
+    for buy in range(start, n):
+        for sell in range(buy + 1, n):
+            for rest in all_trade_sets(n, sell + 1):
+                yield [(buy, sell)] + rest
+
+def log_return(prices, trades, cost):
+    fee = 2 * math.log1p(-cost)
+    return sum(math.log(prices[sell]) - math.log(prices[buy]) + fee for buy, sell in trades)
+
+def brute_force(prices, cost, max_trades):
+    return max(log_return(prices, trades, cost) for trades in all_trade_sets(len(prices))
+               if max_trades is None or len(trades) <= max_trades)
+
+def random_series(seed, n):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+
+CASES = [(seed, n, cost, max_trades)
+         for seed in range(6)
+         for n in (2, 5, 8)
+         for cost in (0.0, 0.001, 0.01)
+         for max_trades in (None, 1, 2, 3)]
+
+@pytest.mark.parametrize("seed, n, cost, max_trades", CASES)
+def test_log_returns_match_brute_force(seed, n, cost, max_trades):
+    prices = random_series(seed, n)
+    returns = optimal_log_returns(prices, cost, max_trades)[0]
+    best = returns if max_trades is None else returns[-1]
+    assert best == pytest.approx(brute_force(prices, cost, max_trades), abs=1e-9)
+
+@pytest.mark.parametrize("seed, n, cost, max_trades", CASES)
+def test_trades_reach_optimum(seed, n, cost, max_trades):
+    prices = random_series(seed, n)
+    trades = optimal_trades(prices, cost, max_trades)
+    assert trades in list(all_trade_sets(n))
+    if max_trades is not None:
+        assert len(trades) <= max_trades
+    assert log_return(prices, trades, cost) == pytest.approx(brute_force(prices, cost, max_trades), abs=1e-9)
+
+@pytest.mark.parametrize("cost, max_trades", [(0.0, None), (0.01, None), (0.005, 1), (0.005, 2)])
+def test_positions_follow_trades(cost, max_trades):
+    rows = np.array([random_series(seed, 8) for seed in range(6)])
+    positions = optimal_positions(rows, cost, max_trades)
+    for row, held in zip(rows, positions):
+        expected = np.zeros(len(row) - 1, dtype=bool)
+        for buy, sell in optimal_trades(row, cost, max_trades):
+            expected[buy:sell] = True
+        assert held.tolist() == expected.tolist()
+
+def test_limits_in_one_pass():
+    prices = random_series(42, 8)
+    by_limit = optimal_log_returns(prices, 0.002, 3)[0]
+    for k in range(4):
+        assert by_limit[k] == pytest.approx(brute_force(prices, 0.002, k), abs=1e-9)
+
+def test_falling_prices_no_trades():
+    prices = np.linspace(110, 90, 6)
+    assert optimal_trades(prices, 0.001, 2) == []
+    assert optimal_log_returns(prices, 0.001)[0] == 0.0
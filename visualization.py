@@ -1,35 +1,185 @@
-import matplotlib.pyplot as plt
 import io
+import sys
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
+def pyplot():
+    """matplotlib импортируется при первом построении графика, а не при запуске бота"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
 class Visualizer:
-    def create_forecast_plot(self, historical, forecast, ticker):
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        # Исторические данные
-        ax.plot(historical, label='История', linewidth=2, color='blue', alpha=0.8)
-        
-        # Прогноз
-        forecast_x = range(len(historical), len(historical) + len(forecast))
-        ax.plot(forecast_x, forecast, label='Прогноз на 30 дней', 
-                linewidth=3, linestyle='--', color='red')
-        
-        # Заполняем область прогноза
-        ax.fill_between(forecast_x, 
-                       forecast * 0.95, 
-                       forecast * 1.05, 
-                       alpha=0.2, color='red')
-        
-        ax.set_xlabel('Дни', fontsize=12)
-        ax.set_ylabel('Цена ($)', fontsize=12)
-        ax.set_title(f'Прогноз цен акций {ticker}', fontsize=16, fontweight='bold')
-        ax.legend(fontsize=11)
-        ax.grid(True, alpha=0.3)
-        
-        # Сохраняем в буфер
+    """Графики на заранее построенных шаблонах.
+
+    Фигура, оси, подписи и легенда создаются один раз; при построении
+    графика заменяются только данные линий. Фигуры создаются без pyplot,
+    поэтому их не нужно закрывать и они не копятся в глобальном состоянии.
+    """
+
+    def __init__(self, width=12, height=6, dpi=150):
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.templates = {}
+
+    def new_figure(self):
+        pyplot()
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=(self.width, self.height), dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        return fig, fig.add_subplot()
+
+    @staticmethod
+    def fix_layout(fig):
+        # Поля считаются один раз вместо bbox_inches='tight' при каждом сохранении;
+        # без движка компоновки savefig рисует фигуру один раз, а не два
+        fig.tight_layout()
+        fig.set_layout_engine('none')
+
+    def forecast_template(self):
+        if 'forecast' not in self.templates:
+            fig, ax = self.new_figure()
+            history, = ax.plot([], [], label='История', linewidth=2, color='blue', alpha=0.8)
+            forecast, = ax.plot([], [], label='Прогноз на 30 дней',
+                                linewidth=3, linestyle='--', color='red')
+            ax.set_xlabel('Дни', fontsize=12)
+            ax.set_ylabel('Цена ($)', fontsize=12)
+            title = ax.set_title('Прогноз цен акций', fontsize=16, fontweight='bold')
+            ax.legend(fontsize=11)
+            ax.grid(True, alpha=0.3)
+            self.fix_layout(fig)
+            self.templates['forecast'] = {
+                'fig': fig, 'ax': ax, 'history': history, 'forecast': forecast,
+                'title': title, 'band': None,
+            }
+        return self.templates['forecast']
+
+    def batch_template(self):
+        if 'batch' not in self.templates:
+            fig, ax = self.new_figure()
+            ax.axhline(0, color='gray', linewidth=1, alpha=0.5)
+            ax.set_xlabel('Дни', fontsize=12)
+            ax.set_ylabel('Изменение к текущей цене (%)', fontsize=12)
+            ax.set_title('Прогноз портфеля на 30 дней', fontsize=16, fontweight='bold')
+            ax.grid(True, alpha=0.3)
+            self.fix_layout(fig)
+            self.templates['batch'] = {'fig': fig, 'ax': ax, 'lines': []}
+        return self.templates['batch']
+
+    def warm_up(self):
+        """Создание шаблонов и первая отрисовка (загрузка шрифтов) заранее"""
+        for template in (self.forecast_template(), self.batch_template()):
+            template['fig'].canvas.draw()
+
+    def render(self, fig):
         buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        plt.close(fig)
+        fig.savefig(buf, format='png')
         buf.seek(0)
-        
-        return buf
\ No newline at end of file
+        return buf
+
+    def create_forecast_plot(self, historical, forecast, ticker):
+        template = self.forecast_template()
+        ax = template['ax']
+        historical = np.asarray(historical, dtype=float)
+        forecast = np.asarray(forecast, dtype=float)
+
+        # Исторические данные и прогноз
+        forecast_x = np.arange(len(historical), len(historical) + len(forecast))
+        template['history'].set_data(np.arange(len(historical)), historical)
+        template['forecast'].set_data(forecast_x, forecast)
+
+        # Область прогноза пересоздается: у PolyCollection нет простой замены данных
+        if template['band'] is not None:
+            template['band'].remove()
+        template['band'] = ax.fill_between(forecast_x, forecast * 0.95, forecast * 1.05,
+                                           alpha=0.2, color='red')
+
+        template['title'].set_text(f'Прогноз цен акций {ticker}')
+        ax.relim()
+        ax.autoscale_view()
+
+        return self.render(template['fig'])
+
+    def create_batch_plot(self, histories, forecasts):
+        """Общий график для нескольких тикеров (в % от текущей цены)"""
+        template = self.batch_template()
+        ax = template['ax']
+        for line in template['lines']:
+            line.remove()
+        template['lines'] = []
+        # Цвета идут по кругу с начала, как на новой фигуре
+        ax.set_prop_cycle(None)
+
+        for ticker, historical in histories.items():
+            historical = np.asarray(historical, dtype=float)
+            forecast = np.asarray(forecasts[ticker], dtype=float)
+            base = historical[-1]
+
+            # Нормируем, чтобы тикеры с разной ценой были сопоставимы
+            line, = ax.plot((historical / base - 1) * 100, label=ticker, linewidth=2, alpha=0.8)
+            forecast_x = np.arange(len(historical), len(historical) + len(forecast))
+            forecast_line, = ax.plot(forecast_x, (forecast / base - 1) * 100,
+                                     linewidth=2, linestyle='--', color=line.get_color())
+            template['lines'] += [line, forecast_line]
+
+        ax.legend(handles=template['lines'][::2], fontsize=11)
+        ax.relim()
+        ax.autoscale_view()
+
+        return self.render(template['fig'])
+
+# Шаблоны графиков в рабочем процессе
+_worker_visualizer = None
+
+def _init_worker(width, height, dpi):
+    global _worker_visualizer
+    _worker_visualizer = Visualizer(width, height, dpi)
+    _worker_visualizer.warm_up()
+
+def _render(method, args):
+    return getattr(_worker_visualizer, method)(*args).getvalue()
+
+class ChartRenderer:
+    """Построение графиков в пуле процессов, вне event loop.
+
+    Каждый процесс при старте загружает matplotlib и строит шаблоны
+    фигур, поэтому запрос только подставляет данные и кодирует PNG.
+    """
+
+    def __init__(self, max_workers=2, width=12, height=6, dpi=150):
+        # fork, как в HeavyModelPool: рабочий процесс не импортирует заново модуль бота
+        if sys.platform.startswith('linux'):
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(width, height, dpi)
+        )
+        # Параметры отрисовки входят в ключ кэша графиков
+        self.settings = (width, height, dpi)
+
+    async def render(self, method, *args):
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self.executor, _render, method, args)
+        return io.BytesIO(data)
+
+    async def forecast_plot(self, historical, forecast, ticker):
+        return await self.render('create_forecast_plot', historical, forecast, ticker)
+
+    async def batch_plot(self, histories, forecasts):
+        return await self.render('create_batch_plot', histories, forecasts)
+
+    def warm_up(self):
+        """Запуск рабочих процессов до первого запроса"""
+        return self.executor.submit(int)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,115 @@
+from collections import deque
+import numpy as np
+
+class IncrementalLinearFit:
+    """Линейная регрессия на накопленных суммах: добавление точки за O(1)"""
+
+    def __init__(self):
+        self.n = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+
+    def update(self, y):
+        x = self.n
+        self.n += 1
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_xx += x * x
+        self.sum_xy += x * y
+
+    def coefficients(self):
+        if self.n < 2:
+            return 0.0, (self.sum_y / self.n if self.n else 0.0)
+        denominator = self.n * self.sum_xx - self.sum_x ** 2
+        slope = (self.n * self.sum_xy - self.sum_x * self.sum_y) / denominator
+        intercept = (self.sum_y - slope * self.sum_x) / self.n
+        return slope, intercept
+
+    def predict(self, steps):
+        """Продолжение тренда с первой точки после обучающих данных"""
+        slope, intercept = self.coefficients()
+        return slope * np.arange(self.n, self.n + steps) + intercept
+
+class SlidingMean:
+    """Среднее последних window значений: сдвиг окна за O(1)"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def update(self, y):
+        self.values.append(y)
+        self.total += y
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+
+    def predict(self, steps):
+        mean = self.total / len(self.values) if self.values else 0.0
+        return np.full(steps, mean)
+
+class WalkForwardEvaluator:
+    """Оценка моделей со скользящей точкой прогноза (walk-forward).
+
+    На каждом шаге модели дообучаются только новыми барами, строят прогноз
+    на horizon дней и сравниваются с фактическими ценами.
+    """
+
+    def __init__(self, horizon=30, min_train=60, step=1, window=10):
+        self.horizon = horizon
+        self.min_train = min_train
+        self.step = step
+        self.window = window
+
+    def config_key(self):
+        return ('walk_forward', self.horizon, self.min_train, self.step)
+
+    def create_models(self, window=None):
+        return {
+            'Линейная модель': IncrementalLinearFit(),
+            'Скользящее среднее': SlidingMean(window or self.window),
+        }
+
+    def evaluate(self, prices, window=None):
+        """Метрики по всем точкам прогноза: {модель: {'RMSE', 'MAPE', 'origins'}}"""
+        prices = np.asarray(prices, dtype=float)
+        n = len(prices)
+
+        # Короткие ряды: уменьшаем горизонт и начальную выборку
+        horizon = min(self.horizon, max(1, n // 3))
+        min_train = min(self.min_train, max(2, n // 2), n - horizon)
+        if min_train < 2:
+            return {}
+
+        models = self.create_models(window)
+        squared = {name: 0.0 for name in models}
+        relative = {name: 0.0 for name in models}
+        eps = np.finfo(np.float64).eps
+
+        fed = 0
+        origins = 0
+        for origin in range(min_train, n - horizon + 1, self.step):
+            # Дообучаем только на барах, появившихся с прошлого шага
+            for y in prices[fed:origin]:
+                for model in models.values():
+                    model.update(y)
+            fed = origin
+
+            actual = prices[origin:origin + horizon]
+            for name, model in models.items():
+                errors = actual - model.predict(horizon)
+                squared[name] += errors @ errors
+                relative[name] += np.sum(np.abs(errors) / np.maximum(np.abs(actual), eps))
+            origins += 1
+
+        count = origins * horizon
+        return {
+            name: {
+                'RMSE': float(np.sqrt(squared[name] / count)),
+                'MAPE': float(relative[name] / count),
+                'origins': origins,
+            }
+            for name in models
+        }
@@ -0,0 +1,78 @@
+import asyncio
+
+from aiohttp import web
+from aiogram.dispatcher.webhook import WebhookRequestHandler
+from aiogram.utils.executor import Executor
+
+class UpdateTasks:
+    """Обновления, которые обрабатываются в фоне после ответа Telegram"""
+
+    def __init__(self):
+        self.tasks = set()
+
+    def spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def drain(self, timeout):
+        """Ожидание начатых обновлений; не успевшие за timeout секунд отменяются"""
+        if not self.tasks:
+            return
+        print(f"[WEBHOOK] Завершаем обработку {len(self.tasks)} обновлений...")
+        _, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+            print(f"[WEBHOOK] Прервано обновлений по таймауту: {len(pending)}")
+
+class BackgroundWebhookHandler(WebhookRequestHandler):
+    """Прием обновления: ответ 'ok' сразу, обработка - в фоновой задаче.
+
+    Стандартный обработчик держит HTTP запрос до конца обработки (анализ
+    может идти десятки секунд в очереди), и Telegram не присылает следующие
+    обновления, пока не получит ответ.
+    """
+
+    async def post(self):
+        self.validate_ip()
+        secret = self.request.app.get('WEBHOOK_SECRET')
+        if secret and self.request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret:
+            raise web.HTTPUnauthorized()
+
+        dispatcher = self.get_dispatcher()
+        update = await self.parse_update(dispatcher.bot)
+        self.request.app['UPDATE_TASKS'].spawn(self.handle(dispatcher, update))
+        return web.Response(text='ok')
+
+    @staticmethod
+    async def handle(dispatcher, update):
+        try:
+            await dispatcher.updates_handler.notify(update)
+        except Exception as e:
+            print(f"[WEBHOOK] Ошибка обработки обновления {update.update_id}: {e}")
+
+def start_webhook(dispatcher, path, host, port, on_startup=None, on_shutdown=None,
+                  secret=None, drain_timeout=30):
+    """Запуск встроенного aiohttp сервера aiogram для приема обновлений.
+
+    При остановке сервер перестает принимать соединения, начатые обновления
+    дорабатывают до drain_timeout секунд, затем вызывается on_shutdown.
+    """
+    app = web.Application()
+    app['UPDATE_TASKS'] = tasks = UpdateTasks()
+    app['WEBHOOK_SECRET'] = secret
+
+    async def drain(_):
+        await tasks.drain(drain_timeout)
+
+    runner = Executor(dispatcher)
+    if on_startup is not None:
+        runner.on_startup(on_startup, polling=False)
+    runner.on_shutdown(drain, polling=False)
+    if on_shutdown is not None:
+        runner.on_shutdown(on_shutdown, polling=False)
+    runner.set_webhook(webhook_path=path, request_handler=BackgroundWebhookHandler, web_app=app)
+    runner.run_app(host=host, port=port)